@@ -0,0 +1,68 @@
+#!/usr/bin/env python
+"""Measure the time the timer plugin adds to the startup of nose.
+
+nose imports every installed plugin on each run, with or without
+``--with-timer``. Each import runs in a fresh interpreter, is repeated and its
+fastest run kept::
+
+    python benchmarks/import_time.py --repeat 20
+"""
+
+import argparse
+import json
+import subprocess
+import sys
+
+# modules only the enabled features of the plugin may import
+LAZY = (
+    'sqlite3', 'termcolor', 'colorama', 'mmap', 'tracemalloc', 'faulthandler',
+    'nosetimer.export', 'nosetimer.memory', 'nosetimer.progress', 'nosetimer.scheduling',
+    'nosetimer.trace', 'nosetimer.watchdog',
+)
+
+_CHILD = """
+import json, sys, timeit
+start = timeit.default_timer()
+import nose.core
+middle = timeit.default_timer()
+{plugin}
+end = timeit.default_timer()
+print(json.dumps({{'nose': middle - start, 'plugin': end - middle,
+                  'modules': [m for m in {lazy!r} if m in sys.modules]}}))
+"""
+
+
+def _run(plugin, repeat):
+    """Get the fastest of ``repeat`` imports."""
+    best = None
+    for _ in range(repeat):
+        code = _CHILD.format(plugin=plugin, lazy=LAZY)
+        output = subprocess.check_output([sys.executable, '-c', code])
+        result = json.loads(output.decode('utf-8'))
+        if best is None or result['plugin'] < best['plugin']:
+            best = result
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--repeat', type=int, default=10)
+    parser.add_argument('--max', type=float, default=None,
+                        help='fail when the plugin takes longer to import, in milliseconds')
+    args = parser.parse_args()
+
+    baseline = _run('pass', args.repeat)
+    result = _run('import nosetimer.plugin', args.repeat)
+    print('{0:>10} {1:>9}'.format('import', 'time'))
+    print('{0:>10} {1:>7.1f}ms'.format('nose', baseline['nose'] * 1e3))
+    print('{0:>10} {1:>7.1f}ms'.format('nosetimer', (result['plugin'] - baseline['plugin']) * 1e3))
+    if result['modules']:
+        print('imported eagerly: {0}'.format(', '.join(result['modules'])))
+        return 1
+    if args.max is not None and (result['plugin'] - baseline['plugin']) * 1e3 > args.max:
+        return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
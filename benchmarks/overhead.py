@@ -0,0 +1,137 @@
+#!/usr/bin/env python
+"""Measure the overhead of the timer plugin on synthetic suites of trivial tests.
+
+Each mode runs in a fresh interpreter, is repeated and its fastest run kept.
+The overhead per test is the difference with a run without the plugin::
+
+    python benchmarks/overhead.py --tests 1000 10000 --processes 0 4
+"""
+
+import argparse
+import json
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import timeit
+
+MODES = [
+    ('baseline', None),
+    ('default', []),
+    ('json', ['--timer-json-file', '{tmpdir}/timings.json']),
+    ('jsonl', ['--timer-jsonl-file', '{tmpdir}/timings.jsonl']),
+    ('bounded', ['--timer-top-n', '10', '--timer-bounded-memory']),
+    ('phases', ['--timer-phases']),
+    ('cpu', ['--timer-cpu']),
+    ('memory', ['--timer-memory']),
+    ('histogram', ['--timer-histogram']),
+    ('tree', ['--timer-tree']),
+    ('imports', ['--timer-imports']),
+]
+
+_SUITE = """
+import unittest
+
+TESTS = {tests}
+PER_CLASS = 100
+
+
+def _make_test(name):
+    def test(self):
+        pass
+    # nose selects methods by their own name
+    test.__name__ = name
+    return test
+
+
+for _i in range(0, TESTS, PER_CLASS):
+    _name = 'Test{{0}}'.format(_i // PER_CLASS)
+    _methods = dict(('test_{{0}}'.format(j), _make_test('test_{{0}}'.format(j)))
+                    for j in range(min(PER_CLASS, TESTS - _i)))
+    globals()[_name] = type(_name, (unittest.TestCase,), _methods)
+"""
+
+
+def _child(argv):
+    """Run nose in this process, print the measurements as JSON."""
+    import nose
+    from nosetimer import memory
+    from nosetimer.plugin import TimerPlugin
+
+    plugin = TimerPlugin()
+    report_time = [0.0]
+    report = plugin.report
+
+    def _timed_report(stream):
+        start = timeit.default_timer()
+        report(stream)
+        report_time[0] = timeit.default_timer() - start
+
+    plugin.report = _timed_report
+    stdout, sys.stdout = sys.stdout, sys.stderr
+    start = timeit.default_timer()
+    nose.run(argv=['nosetests'] + argv, addplugins=[plugin])
+    total = timeit.default_timer() - start
+    stdout.write(json.dumps({'total': total, 'report': report_time[0], 'peak': memory.max_rss()}))
+
+
+def _run(argv, repeat):
+    """Get the fastest of ``repeat`` runs of a mode."""
+    best = None
+    for _ in range(repeat):
+        with open(os.devnull, 'w') as devnull:
+            output = subprocess.check_output([sys.executable, __file__, '--child'] + argv, stderr=devnull)
+        result = json.loads(output.decode('utf-8'))
+        if best is None or result['total'] < best['total']:
+            best = result
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--tests', type=int, nargs='+', default=[1000, 10000],
+                        help='number of tests of each suite')
+    parser.add_argument('--processes', type=int, nargs='+', default=[0],
+                        help='numbers of multiprocess workers, 0 runs in a single process')
+    parser.add_argument('--modes', nargs='+', choices=[name for name, _ in MODES],
+                        help='plugin modes to measure, all by default')
+    parser.add_argument('--repeat', type=int, default=3)
+    args = parser.parse_args()
+    modes = [(name, options) for name, options in MODES if name == 'baseline' or name in (args.modes or [name])]
+
+    print('{0:>10} {1:>8} {2:>5} {3:>9} {4:>13} {5:>10} {6:>9}'.format(
+        'mode', 'tests', 'procs', 'total', 'overhead/test', 'report', 'peak'))
+    for tests in args.tests:
+        tmpdir = tempfile.mkdtemp(prefix='nose-timer-bench-')
+        try:
+            with open(os.path.join(tmpdir, 'test_synthetic.py'), 'w') as f:
+                f.write(_SUITE.format(tests=tests))
+            for processes in args.processes:
+                baseline = None
+                for name, options in modes:
+                    argv = [tmpdir, '--processes={0}'.format(processes)]
+                    if options is not None:
+                        argv += ['--with-timer'] + [o.format(tmpdir=tmpdir) for o in options]
+                    result = _run(argv, args.repeat)
+                    if baseline is None:
+                        baseline = result
+                    print('{0:>10} {1:>8} {2:>5} {3:>8.3f}s {4:>11.1f}us {5:>8.1f}ms {6:>7.1f}MB'.format(
+                        name,
+                        tests,
+                        processes,
+                        result['total'],
+                        (result['total'] - baseline['total']) / tests * 1e6,
+                        result['report'] * 1e3,
+                        result['peak'] / float(1 << 20),
+                    ))
+                    sys.stdout.flush()
+        finally:
+            shutil.rmtree(tmpdir)
+
+
+if __name__ == '__main__':
+    if sys.argv[1:2] == ['--child']:
+        _child(sys.argv[2:])
+    else:
+        main()
@@ -0,0 +1,72 @@
+"""Tools for the timing files of the timer plugin::
+
+    python -m nosetimer convert timings.json timings.ntb
+    python -m nosetimer diff old.json new.json --fail-over 20%
+"""
+
+import argparse
+import sys
+
+from nosetimer import diff
+from nosetimer import export
+
+
+def _convert(args):
+    export.convert(args.source, args.destination)
+    return 0
+
+
+def _diff(args):
+    result = diff.Diff.from_files(args.old, args.new)
+    result.report(sys.stdout, limit=None if args.top_n == -1 else args.top_n)
+    if args.fail_over is not None and result.regressions(*args.fail_over):
+        return 1
+    return 0
+
+
+def _threshold(value):
+    try:
+        return diff.parse_threshold(value)
+    except ValueError as e:
+        raise argparse.ArgumentTypeError(str(e))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog='python -m nosetimer', description=__doc__.splitlines()[0])
+    commands = parser.add_subparsers(dest='command')
+    commands.required = True
+
+    convert = commands.add_parser(
+        'convert',
+        help='convert an export to the JSON, JSON Lines or binary format',
+        description=(
+            'Convert a --timer-json-file, --timer-jsonl-file or --timer-binary-file export. '
+            'The format of the destination is guessed from its extension: .json, .jsonl, or binary otherwise.'
+        ),
+    )
+    convert.add_argument('source')
+    convert.add_argument('destination')
+    convert.set_defaults(func=_convert)
+
+    compare = commands.add_parser(
+        'diff',
+        help='compare the test times of two exports',
+        description=(
+            'Report the tests and modules that got significantly slower or faster, and the new and removed tests.'
+        ),
+    )
+    compare.add_argument('old')
+    compare.add_argument('new')
+    compare.add_argument('--top-n', type=int, default=20,
+                         help='lines shown per section, -1 shows them all (default: %(default)s)')
+    compare.add_argument('--fail-over', type=_threshold, default=None, metavar='THRESHOLD',
+                         help=('exit with status 1 when a test got significantly slower by more than said time, '
+                               'e.g. 100ms or 0.5s, or said percentage of its old time, e.g. 20%%'))
+    compare.set_defaults(func=_diff)
+
+    args = parser.parse_args(argv)
+    return args.func(args)
+
+
+if __name__ == '__main__':
+    sys.exit(main())
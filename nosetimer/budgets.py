@@ -0,0 +1,99 @@
+"""Per-test time budgets, declared in the tests or in a budget file."""
+
+import fnmatch
+import inspect
+import re
+import sys
+
+from nose.case import FunctionTestCase
+from nose.case import MethodTestCase
+
+ATTRIBUTE = '_timer_budget'
+
+
+def budget(limit):
+    """Declare the time budget of a test function, method or class.
+
+    ``limit`` is a time like the ``--timer-ok`` option takes, e.g. ``5ms`` or
+    ``2s``; tests going over it fail. A module declares the budget of its
+    tests with a ``_timer_budget`` global.
+    """
+    def decorator(obj):
+        setattr(obj, ATTRIBUTE, limit)
+        return obj
+    return decorator
+
+
+def read_rules(path):
+    """Read the ``(glob, limit)`` rules of a budget file.
+
+    Each line holds a glob matching test ids and a budget, e.g.
+    ``tests.db.* 2s``. Empty lines and ``#`` comments are ignored.
+    """
+    rules = []
+    with open(path) as f:
+        for number, line in enumerate(f, 1):
+            line = line.split('#', 1)[0].strip()
+            if not line:
+                continue
+            try:
+                pattern, limit = line.split()
+            except ValueError:
+                raise ValueError("Could not parse line {0} of '{1}': {2}".format(number, path, line))
+            rules.append((pattern, limit))
+    return rules
+
+
+def _own(obj):
+    """Get the budget declared on ``obj`` itself, never a mocked or proxied one."""
+    obj = getattr(obj, '__func__', obj)
+    if inspect.isclass(obj):
+        for klass in inspect.getmro(obj):
+            if ATTRIBUTE in vars(klass):
+                return vars(klass)[ATTRIBUTE]
+        return None
+    return getattr(obj, '__dict__', {}).get(ATTRIBUTE)
+
+
+def declared(case):
+    """Get the budget declared by the function, class or module of a test case."""
+    # nose wraps test functions, and methods of non-TestCase classes
+    if isinstance(case, MethodTestCase):
+        func, cls = case.method, case.cls
+    elif isinstance(case, FunctionTestCase):
+        func, cls = case.test, None
+    else:
+        name = getattr(case, '_testMethodName', None)
+        func = getattr(case, name, None) if isinstance(name, str) else None
+        cls = type(case)
+    module = sys.modules.get(getattr(cls or func, '__module__', None))
+    for obj in (func, cls, module):
+        if obj is not None:
+            limit = _own(obj)
+            if limit is not None:
+                return limit
+    return None
+
+
+class Budgets(object):
+    """Resolve the budget of a test as it completes.
+
+    Budgets declared in the tests win over the budget file, whose first
+    matching rule wins. ``parse`` turns a declared limit into milliseconds.
+    Each test is only looked up once (or twice with ``--timer-repeat``), so
+    nothing is cached.
+    """
+
+    def __init__(self, parse, rules=()):
+        self._parse = parse
+        self._rules = [(re.compile(fnmatch.translate(pattern)), parse(limit)) for pattern, limit in rules]
+
+    def get(self, test_id, case):
+        """Get the budget of a test in milliseconds, or ``None``."""
+        limit = declared(case)
+        if limit is not None:
+            return self._parse(limit)
+        for regex, rule_limit in self._rules:
+            if regex.match(test_id):
+                return rule_limit
+        return None
@@ -0,0 +1,88 @@
+"""Nanosecond clock of the timer plugin, and the calibration of its overhead."""
+
+import time
+import timeit
+import unittest
+
+from nosetimer import stats
+
+if hasattr(time, 'perf_counter_ns'):
+    now_ns = time.perf_counter_ns
+else:  # pragma: no cover
+    def now_ns():
+        """Get the time of the most precise clock, in integer nanoseconds."""
+        return int(timeit.default_timer() * 1e9)
+
+
+def seconds(ns):
+    """Convert integer nanoseconds to float seconds."""
+    return ns / 1e9
+
+
+# the clock of now_ns may start anywhere, e.g. at boot
+_EPOCH_OFFSET = time.time() - seconds(now_ns())
+
+
+def timestamp(ns):
+    """Convert a :func:`now_ns` time to seconds since the epoch, comparable across processes."""
+    return _EPOCH_OFFSET + seconds(ns)
+
+
+def resolution_ns():
+    """Get the resolution of :func:`now_ns`, in nanoseconds."""
+    if hasattr(time, 'get_clock_info'):
+        return max(int(time.get_clock_info('perf_counter').resolution * 1e9), 1)
+    # Python 2 has no clock info, wait for the clock to tick
+    start = now_ns()
+    tick = 0
+    while not tick:  # pragma: no cover
+        tick = now_ns() - start
+    return tick
+
+
+class _Empty(unittest.TestCase):
+
+    def runTest(self):
+        pass
+
+
+class _CalibrationResult(unittest.TestResult):
+    """Time the empty tests between ``startTest`` and ``addSuccess``, like the plugin."""
+
+    def __init__(self):
+        super(_CalibrationResult, self).__init__()
+        self.samples = []
+        self._start = None
+
+    def startTest(self, test):
+        super(_CalibrationResult, self).startTest(test)
+        self._start = now_ns()
+
+    def addSuccess(self, test):
+        self.samples.append(now_ns() - self._start)
+
+
+class Calibration(object):
+    """Overhead of timing a test, out of the durations of empty tests.
+
+    ``overhead_ns`` is the fastest empty test, the part of any measured time
+    that is not spent in the test; ``uncertainty_ns`` is how much slower the
+    95th percentile of the empty tests is, i.e. the noise of a measurement.
+    """
+
+    __slots__ = ('overhead_ns', 'uncertainty_ns', 'resolution_ns')
+
+    def __init__(self, samples, resolution):
+        samples = sorted(samples)
+        self.overhead_ns = samples[0]
+        self.uncertainty_ns = int(stats.percentile(samples, 95)) - samples[0]
+        self.resolution_ns = resolution
+
+    @classmethod
+    def measure(cls, runs=1000):
+        """Time ``runs`` empty tests."""
+        result = _CalibrationResult()
+        test = _Empty()
+        for _ in range(runs):
+            test.run(result)
+        return cls(result.samples, resolution_ns())
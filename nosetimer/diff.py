@@ -0,0 +1,177 @@
+"""Differences between the test times of two exports."""
+
+import math
+import re
+
+from nosetimer import export
+from nosetimer import stats
+
+
+def module_of(test_id):
+    """Get the module of a test, the parent of its id without the class, if any.
+
+    Only the part right before the test name can be its class, as told by
+    its capital, so packages and modules may be capitalized too.
+    """
+    parts = stats.TimingTree.split(test_id)[:-1]
+    if len(parts) > 1 and parts[-1][:1].isupper():
+        parts.pop()
+    return '.'.join(parts) or test_id
+
+
+def parse_threshold(value):
+    """Parse a ``--fail-over`` threshold: ``'20%'`` is relative, ``'100ms'`` or ``'0.1'`` absolute (seconds).
+
+    Returns a ``(seconds, ratio)`` pair, one of them being ``None``.
+    """
+    match = re.match(r'^(?P<value>\d+\.?\d*)(?P<units>s|ms|%)?$', value)
+    if match is None:
+        raise ValueError("Invalid threshold '{0}'".format(value))
+    number, units = float(match.group('value')), match.group('units')
+    if units == '%':
+        return None, number / 100.0
+    return number / 1000.0 if units == 'ms' else number, None
+
+
+class Diff(object):
+    """Per-test and per-module differences between an old and a new run.
+
+    A change is significant when it stands out of the noise: with
+    ``--timer-repeat`` spreads in both runs, by comparing the difference to
+    them; otherwise, by comparing its ratio to the ratios of all the tests,
+    most of which did not change, like the history does with past runs.
+    """
+
+    # a change must be this many (scaled) median absolute deviations away...
+    min_score = 3.5
+    # ...and at least this long, shorter tests are too noisy to tell
+    min_delta = 0.001
+
+    def __init__(self, old, new_records):
+        """Compare ``old``, a ``{test_id: record}`` mapping, to the ``new_records`` items.
+
+        ``old`` is consumed, the tests found in both runs are kept instead.
+        """
+        # (test_id, old time, new time, old stdev, new stdev)
+        matched = []
+        self.added = []
+        for test_id, record in new_records:
+            previous = old.pop(test_id, None)
+            if previous is None:
+                self.added.append((test_id, record['time']))
+            else:
+                matched.append((test_id, previous['time'], record['time'], previous.get('stdev'), record.get('stdev')))
+        self.removed = [(test_id, record['time']) for test_id, record in old.items()]
+        old.clear()
+
+        self._noise = self._log_ratio_noise(matched)
+        # (test_id, old time, new time, significant), largest regression first
+        self.tests = sorted(
+            ((test_id, before, after, self._is_significant(before, after, s_before, s_after))
+             for test_id, before, after, s_before, s_after in matched),
+            key=lambda item: item[2] - item[1],
+            reverse=True,
+        )
+
+        modules = {}
+        for test_id, before, after, _ in self.tests:
+            self._add(modules, test_id, before, after)
+        for test_id, before in self.removed:
+            self._add(modules, test_id, before, 0.0)
+        for test_id, after in self.added:
+            self._add(modules, test_id, 0.0, after)
+        # (module, old time, new time), largest regression first
+        self.modules = sorted(
+            ((module, before, after) for module, (before, after) in modules.items()),
+            key=lambda item: item[2] - item[1],
+            reverse=True,
+        )
+        self.added.sort(key=lambda item: item[1], reverse=True)
+        self.removed.sort(key=lambda item: item[1], reverse=True)
+
+    @classmethod
+    def from_files(cls, old_path, new_path):
+        """Compare two exports, in any format :func:`export.read` takes."""
+        old = dict(
+            (test_id, dict((k, record[k]) for k in ('time', 'stdev') if k in record))
+            for test_id, record in export.iter_records(old_path)
+        )
+        return cls(old, export.iter_records(new_path))
+
+    @staticmethod
+    def _add(modules, test_id, before, after):
+        times = modules.setdefault(module_of(test_id), [0.0, 0.0])
+        times[0] += before
+        times[1] += after
+
+    @staticmethod
+    def _log_ratio_noise(matched):
+        """Get the median and the scaled MAD of the log ratios of the new to the old times."""
+        ratios = sorted(math.log(after / before) for _, before, after, _, _ in matched if before > 0 and after > 0)
+        if not ratios:
+            return None
+        median = stats.median(ratios)
+        # 1.4826 scales the MAD to a standard deviation for normal data
+        return median, stats.mad(ratios, median) * 1.4826
+
+    def _is_significant(self, before, after, s_before, s_after):
+        if abs(after - before) < self.min_delta:
+            return False
+        if s_before is not None and s_after is not None and (s_before or s_after):
+            return abs(after - before) / math.hypot(s_before, s_after) > self.min_score
+        if before <= 0 or after <= 0 or self._noise is None:
+            return True
+        median, spread = self._noise
+        deviation = abs(math.log(after / before) - median)
+        return deviation > 0 if spread == 0 else deviation / spread > self.min_score
+
+    @property
+    def totals(self):
+        """Get the total time of the old and the new run."""
+        before = sum(item[1] for item in self.tests) + sum(time_taken for _, time_taken in self.removed)
+        after = sum(item[2] for item in self.tests) + sum(time_taken for _, time_taken in self.added)
+        return before, after
+
+    def regressions(self, seconds=None, ratio=None):
+        """Get the significant regressions over ``seconds``, or over ``ratio`` of the old time."""
+        return [
+            item for item in self.tests
+            if item[3] and item[2] > item[1]
+            and (seconds is None or item[2] - item[1] > seconds)
+            and (ratio is None or item[1] == 0 or (item[2] - item[1]) / item[1] > ratio)
+        ]
+
+    def report(self, stream, limit=20):
+        """Write the differences, ``limit`` lines per section (all of them with ``None``)."""
+        def write(line):
+            stream.write(line + '\n')
+
+        def change(before, after):
+            percent = '' if before == 0 else ' {0:+0.2f}%'.format((after - before) / before * 100)
+            return '{0:+0.4f}s{1} ({2:0.4f}s -> {3:0.4f}s)'.format(after - before, percent, before, after)
+
+        slower = [item for item in self.tests if item[3] and item[2] > item[1]]
+        faster = [item for item in reversed(self.tests) if item[3] and item[2] < item[1]]
+        for title, items in (('Slower tests:', slower), ('Faster tests:', faster)):
+            if items:
+                write(title)
+                for test_id, before, after, _ in items[:limit]:
+                    write('{0}: {1}'.format(test_id, change(before, after)))
+
+        modules = [item for item in self.modules if item[1] != item[2]]
+        if modules:
+            write('Modules:')
+            # largest changes first, whichever the way
+            modules.sort(key=lambda item: abs(item[2] - item[1]), reverse=True)
+            for module, before, after in modules[:limit]:
+                write('{0}: {1}'.format(module, change(before, after)))
+
+        for title, items in (('New tests:', self.added), ('Removed tests:', self.removed)):
+            if items:
+                write('{0} {1}, {2:0.4f}s'.format(title, len(items), sum(time_taken for _, time_taken in items)))
+                for test_id, time_taken in items[:limit]:
+                    write('{0}: {1:0.4f}s'.format(test_id, time_taken))
+
+        before, after = self.totals
+        write('Total: {0}, {1} tests significantly slower, {2} faster'.format(
+            change(before, after), len(slower), len(faster)))
@@ -0,0 +1,391 @@
+"""Readers and writers for the timing files of the timer plugin."""
+
+import array
+import io
+import json
+import mmap
+import os
+import struct
+import sys
+import timeit
+
+BINARY_MAGIC = b'NTB1'
+# magic, numbers of tests and of test id prefixes, sizes of the names and prefixes
+_HEADER = struct.Struct('<4sIIII')
+# the status column holds the index of the status in this tuple
+STATUSES = (None, 'success', 'fail', 'error', 'timeout')
+
+
+def read_json(path):
+    """Read a ``--timer-json-file`` export.
+
+    Returns a ``{test_id: {'time': ..., 'status': ...}}`` mapping.
+    """
+    with open(path) as f:
+        return json.load(f)['tests']
+
+
+def read_jsonl(path):
+    """Read a ``--timer-jsonl-file`` export.
+
+    Returns a ``{test_id: {'time': ..., 'status': ...}}`` mapping. The torn
+    last line of an interrupted run is ignored.
+    """
+    return dict(iter_jsonl(path))
+
+
+def iter_jsonl(path):
+    """Iterate over the ``(test_id, record)`` items of a ``--timer-jsonl-file`` export."""
+    with open(path, 'rb') as f:
+        for line in f:
+            if line.endswith(b'\n'):
+                record = json.loads(line.decode('utf-8'))
+                yield record.pop('id'), record
+
+
+class _JsonReader(object):
+    """Read the JSON values of a file one by one, reading it in chunks."""
+
+    _WHITESPACE = ' \t\n\r'
+
+    def __init__(self, f, chunk_size):
+        self._f = f
+        self._chunk_size = chunk_size
+        self._decoder = json.JSONDecoder()
+        self._buffer = u''
+        self._pos = 0
+
+    def _fill(self):
+        # read more as values get larger, so a large value is not parsed again and again
+        chunk = self._f.read(max(self._chunk_size, len(self._buffer) - self._pos))
+        if not chunk:
+            return False
+        self._buffer = self._buffer[self._pos:] + chunk
+        self._pos = 0
+        return True
+
+    def _skip_whitespace(self):
+        while True:
+            while self._pos < len(self._buffer) and self._buffer[self._pos] in self._WHITESPACE:
+                self._pos += 1
+            if self._pos < len(self._buffer) or not self._fill():
+                return
+
+    def consume(self, char):
+        """Skip ``char`` if it comes next."""
+        self._skip_whitespace()
+        if self._buffer[self._pos:self._pos + 1] == char:
+            self._pos += 1
+            return True
+        return False
+
+    def expect(self, char):
+        if not self.consume(char):
+            raise ValueError("Expecting '{0}' in '{1}'".format(char, self._f.name))
+
+    def value(self):
+        self._skip_whitespace()
+        while True:
+            try:
+                value, end = self._decoder.raw_decode(self._buffer, self._pos)
+            except ValueError:
+                if not self._fill():
+                    raise
+                continue
+            # a number may go on in the next chunk
+            if end == len(self._buffer) and self._fill():
+                continue
+            self._pos = end
+            return value
+
+    def members(self):
+        """Iterate over the keys of an object, the reader being on their values."""
+        self.expect('{')
+        if self.consume('}'):
+            return
+        while True:
+            key = self.value()
+            self.expect(':')
+            yield key
+            if self.consume('}'):
+                return
+            self.expect(',')
+
+
+def iter_json(path, chunk_size=1 << 16):
+    """Iterate over the ``(test_id, record)`` items of a ``--timer-json-file`` export.
+
+    The file is parsed as it is read, so that only one record at a time is
+    held in memory, whatever the size of the export.
+    """
+    with io.open(path, encoding='utf-8') as f:
+        reader = _JsonReader(f, chunk_size)
+        for key in reader.members():
+            if key == 'tests':
+                for test_id in reader.members():
+                    yield test_id, reader.value()
+            else:
+                reader.value()
+
+
+def iter_records(path):
+    """Iterate over the ``(test_id, record)`` items of an export, guessing its format like :func:`read`."""
+    if path.endswith('.jsonl'):
+        return iter_jsonl(path)
+    if is_binary(path):
+        return _iter_binary(path)
+    return iter_json(path)
+
+
+def _iter_binary(path):
+    with BinaryTimings(path) as timings:
+        for i, (time_taken, status) in enumerate(zip(timings.times, timings.statuses)):
+            yield timings.test_id(i), {'time': time_taken, 'status': STATUSES[status]}
+
+
+def read_binary(path):
+    """Read a ``--timer-binary-file`` export.
+
+    Returns a ``{test_id: {'time': ..., 'status': ...}}`` mapping.
+    """
+    with BinaryTimings(path) as timings:
+        return timings.to_dict()
+
+
+def is_binary(path):
+    """Tell whether the file at ``path`` is a binary export."""
+    with open(path, 'rb') as f:
+        return f.read(len(BINARY_MAGIC)) == BINARY_MAGIC
+
+
+def read(path):
+    """Read an export, guessing its format from the file extension or contents."""
+    if path.endswith('.jsonl'):
+        return read_jsonl(path)
+    if is_binary(path):
+        return read_binary(path)
+    return read_json(path)
+
+
+def _column(typecode, data):
+    """Get a little-endian column of ``data`` as an array."""
+    column = array.array(typecode)
+    if hasattr(column, 'frombytes'):
+        column.frombytes(data)
+    else:  # pragma: no cover
+        column.fromstring(data)
+    if sys.byteorder == 'big':  # pragma: no cover
+        column.byteswap()
+    return column
+
+
+def _to_bytes(column):
+    if sys.byteorder == 'big':  # pragma: no cover
+        column = array.array(column.typecode, column)
+        column.byteswap()
+    return column.tobytes() if hasattr(column, 'tobytes') else column.tostring()
+
+
+def _split_id(test_id):
+    """Split a test id into its module/class prefix and its name."""
+    # generator arguments may hold dots too
+    dot = test_id.split('(', 1)[0].rfind('.') + 1
+    return test_id[:dot], test_id[dot:]
+
+
+class _Blob(object):
+    """UTF-8 strings stored back to back, with the offset of their ends."""
+
+    def __init__(self):
+        self.offsets = array.array('I')
+        self.chunks = []
+        self.size = 0
+
+    def append(self, string):
+        encoded = string.encode('utf-8')
+        self.chunks.append(encoded)
+        self.size += len(encoded)
+        self.offsets.append(self.size)
+
+
+def write_binary(path, timed_tests):
+    """Write ``(test_id, {'time': ..., 'status': ...})`` items in the binary format.
+
+    Test ids are split into their module/class prefix, stored once in a
+    table, and their name. After a header come fixed-width columns: the times
+    as 64-bit floats, the prefix indexes and the name end offsets as 32-bit
+    ints, and the statuses as bytes. Then come the prefix end offsets, and
+    the UTF-8 names and prefixes. Other fields of the records are not kept.
+    """
+    times = array.array('d')
+    statuses = array.array('B')
+    prefix_indexes = array.array('I')
+    names = _Blob()
+    prefixes = _Blob()
+    interned = {}
+    for test_id, record in timed_tests:
+        prefix, name = _split_id(test_id)
+        index = interned.get(prefix)
+        if index is None:
+            index = interned[prefix] = len(interned)
+            prefixes.append(prefix)
+        try:
+            statuses.append(STATUSES.index(record.get('status')))
+        except ValueError:
+            raise ValueError("Unknown status '{0}' of {1}".format(record['status'], test_id))
+        times.append(record['time'])
+        prefix_indexes.append(index)
+        names.append(name)
+    with open(path, 'wb') as f:
+        f.write(_HEADER.pack(BINARY_MAGIC, len(times), len(interned), names.size, prefixes.size))
+        for column in (times, prefix_indexes, names.offsets, statuses, prefixes.offsets):
+            f.write(_to_bytes(column))
+        f.write(b''.join(names.chunks))
+        f.write(b''.join(prefixes.chunks))
+
+
+class BinaryTimings(object):
+    """Memory-mapped ``--timer-binary-file`` export.
+
+    The ``times`` and ``statuses`` columns are loaded as arrays, while test
+    ids are only decoded when asked for, so loading is fast even for huge
+    files.
+    """
+
+    def __init__(self, path):
+        with open(path, 'rb') as f:
+            header = f.read(_HEADER.size)
+            if len(header) < _HEADER.size or header[:len(BINARY_MAGIC)] != BINARY_MAGIC:
+                raise ValueError("'{0}' is not a binary timing export".format(path))
+            _, count, prefix_count, names_size, prefixes_size = _HEADER.unpack(header)
+            self._map = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        start = _HEADER.size
+        columns = []
+        for typecode, width, length in (('d', 8, count), ('I', 4, count), ('I', 4, count),
+                                        ('B', 1, count), ('I', 4, prefix_count)):
+            columns.append(_column(typecode, self._map[start:start + width * length]))
+            start += width * length
+        self.times, self._prefix_indexes, self._name_offsets, self.statuses, prefix_offsets = columns
+        self._names_start = start
+        if len(self._map) < start + names_size + prefixes_size:
+            self.close()
+            raise ValueError("'{0}' is truncated".format(path))
+        prefixes = self._map[start + names_size:start + names_size + prefixes_size]
+        self._prefixes = [
+            prefixes[begin:end].decode('utf-8')
+            for begin, end in zip(array.array('I', [0]) + prefix_offsets, prefix_offsets)
+        ]
+        self._index = None
+
+    def __len__(self):
+        return len(self.times)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def test_id(self, i):
+        """Get the id of the ``i``-th test."""
+        begin = self._names_start + (self._name_offsets[i - 1] if i else 0)
+        name = self._map[begin:self._names_start + self._name_offsets[i]].decode('utf-8')
+        return self._prefixes[self._prefix_indexes[i]] + name
+
+    def ids(self):
+        return [self.test_id(i) for i in range(len(self))]
+
+    def status(self, i):
+        return STATUSES[self.statuses[i]]
+
+    def get(self, test_id):
+        """Get the ``{'time': ..., 'status': ...}`` record of a test, or ``None``."""
+        if self._index is None:
+            self._index = dict((test_id, i) for i, test_id in enumerate(self.ids()))
+        i = self._index.get(test_id)
+        if i is None:
+            return None
+        return {'time': self.times[i], 'status': self.status(i)}
+
+    def to_dict(self):
+        return dict(
+            (test_id, {'time': time_taken, 'status': STATUSES[status]})
+            for test_id, time_taken, status in zip(self.ids(), self.times, self.statuses)
+        )
+
+    def close(self):
+        self._map.close()
+
+
+def convert(source, destination):
+    """Convert an export to the format of ``destination``, guessed from its extension.
+
+    ``.json`` destinations get the ``--timer-json-file`` format, ``.jsonl``
+    ones the ``--timer-jsonl-file`` one, and any other the binary format.
+    """
+    timed_tests = read(source)
+    if destination.endswith('.jsonl'):
+        JsonLinesWriter.truncate(destination)
+        writer = JsonLinesWriter(destination)
+        for test_id, record in timed_tests.items():
+            writer.write(dict(record, id=test_id))
+        writer.close()
+    elif destination.endswith('.json'):
+        with open(destination, 'w') as f:
+            json.dump({'tests': timed_tests}, f)
+    else:
+        write_binary(destination, timed_tests.items())
+
+
+def durations(timed_tests):
+    """Get a ``{test_id: time}`` mapping out of exported records."""
+    return dict((k, v['time']) for k, v in timed_tests.items())
+
+
+def failures(timed_tests):
+    """Get the ids of the failed, errored and timed out tests out of exported records."""
+    return set(k for k, v in timed_tests.items() if v.get('status') in ('fail', 'error', 'timeout'))
+
+
+class JsonLinesWriter(object):
+    """Append compact JSON records to a file, one per line.
+
+    Records are buffered and written (then fsync'd) in chunks, every
+    ``flush_every`` records or ``flush_interval`` seconds. Each chunk is a
+    single ``write()`` on a file opened in append mode, so several processes
+    can share the same file.
+    """
+
+    flush_every = 100
+    flush_interval = 1.0
+
+    def __init__(self, path):
+        self.path = path
+        self._fd = os.open(path, os.O_WRONLY | os.O_CREAT | os.O_APPEND, 0o644)
+        self._buffer = []
+        self._last_flush = timeit.default_timer()
+
+    @staticmethod
+    def truncate(path):
+        """Empty the file at ``path`` before a new run."""
+        open(path, 'w').close()
+
+    def write(self, record):
+        self._buffer.append(json.dumps(record, separators=(',', ':')))
+        if (len(self._buffer) >= self.flush_every
+                or timeit.default_timer() - self._last_flush >= self.flush_interval):
+            self.flush()
+
+    def flush(self):
+        if self._buffer:
+            os.write(self._fd, ('\n'.join(self._buffer) + '\n').encode('utf-8'))
+            os.fsync(self._fd)
+            self._buffer = []
+        self._last_flush = timeit.default_timer()
+
+    def close(self):
+        if self._fd is None:
+            return
+        self.flush()
+        os.close(self._fd)
+        self._fd = None
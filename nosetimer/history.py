@@ -0,0 +1,126 @@
+"""Append-only timing history backed by SQLite."""
+
+import sqlite3
+import time
+
+from nosetimer import stats
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS runs (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    started REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS timings (
+    run_id INTEGER NOT NULL,
+    test_id TEXT NOT NULL,
+    time REAL NOT NULL,
+    status TEXT
+);
+CREATE INDEX IF NOT EXISTS timings_run_id ON timings (run_id);
+"""
+
+
+class Baseline(object):
+    """Rolling timing baseline of a single test."""
+
+    __slots__ = ('median', 'p95', 'mad', 'samples')
+
+    def __init__(self, times):
+        times = sorted(times)
+        self.samples = len(times)
+        self.median = stats.median(times)
+        self.p95 = stats.percentile(times, 95)
+        self.mad = stats.mad(times, self.median)
+
+
+class TimingHistory(object):
+    """Per-test timings of every recorded run, keyed by ``test.id()``.
+
+    Rows are only ever appended; baselines are computed over the last
+    ``window`` runs preceding the current one.
+    """
+
+    # minimum number of past samples before a test can be flagged
+    min_samples = 5
+    # a regression must be this many times slower than the median...
+    min_ratio = 1.5
+    # ...and this many (scaled) median absolute deviations above it
+    min_score = 3.5
+
+    def __init__(self, path, window=20):
+        self.path = path
+        self.window = window
+        self._conn = sqlite3.connect(path)
+        self._conn.executescript(_SCHEMA)
+
+    def close(self):
+        self._conn.close()
+
+    def baselines(self):
+        """Get a ``{test_id: Baseline}`` mapping for the last runs."""
+        samples = {}
+        rows = self._conn.execute(
+            "SELECT test_id, time FROM timings WHERE run_id IN "
+            "(SELECT id FROM runs ORDER BY id DESC LIMIT ?)",
+            (self.window,),
+        )
+        for test_id, time_taken in rows:
+            samples.setdefault(test_id, []).append(time_taken)
+        return dict((k, Baseline(v)) for k, v in samples.items())
+
+    def durations(self):
+        """Get the median duration of every test over the last runs."""
+        return dict((k, v.median) for k, v in self.baselines().items())
+
+    def failures(self):
+        """Get the ids of the tests that failed, errored or timed out in the last run."""
+        rows = self._conn.execute(
+            "SELECT test_id FROM timings WHERE run_id = (SELECT MAX(id) FROM runs) "
+            "AND status IN ('fail', 'error', 'timeout')"
+        )
+        return set(test_id for test_id, in rows)
+
+    def failure_rates(self):
+        """Get the fraction of the last runs in which each test failed, errored or timed out."""
+        rows = self._conn.execute(
+            "SELECT test_id, AVG(status IN ('fail', 'error', 'timeout')) FROM timings WHERE run_id IN "
+            "(SELECT id FROM runs ORDER BY id DESC LIMIT ?) GROUP BY test_id",
+            (self.window,),
+        )
+        return dict(rows)
+
+    def record(self, timed_tests):
+        """Append a new run made of ``(test_id, {'time', 'status'})`` items."""
+        with self._conn:
+            cursor = self._conn.execute("INSERT INTO runs (started) VALUES (?)", (time.time(),))
+            run_id = cursor.lastrowid
+            self._conn.executemany(
+                "INSERT INTO timings (run_id, test_id, time, status) VALUES (?, ?, ?, ?)",
+                ((run_id, k, v['time'], v['status']) for k, v in timed_tests),
+            )
+        return run_id
+
+    def is_regression(self, time_taken, baseline):
+        """Tell whether ``time_taken`` is significantly slower than ``baseline``."""
+        if baseline is None or baseline.samples < self.min_samples:
+            return False
+        if time_taken <= baseline.p95 or time_taken < baseline.median * self.min_ratio:
+            return False
+        # 1.4826 scales the MAD to a standard deviation for normal data
+        spread = baseline.mad * 1.4826
+        if spread == 0:
+            return True
+        return (time_taken - baseline.median) / spread > self.min_score
+
+    def regressions(self, timed_tests, baselines):
+        """Get ``(test_id, time, status, baseline)`` of the regressed tests.
+
+        The result is sorted from the worst regression down.
+        """
+        found = []
+        for test_id, time_and_status in timed_tests:
+            baseline = baselines.get(test_id)
+            if self.is_regression(time_and_status['time'], baseline):
+                found.append((test_id, time_and_status['time'], time_and_status['status'], baseline))
+        found.sort(key=lambda item: item[1] / item[3].median if item[3].median else float('inf'), reverse=True)
+        return found
@@ -0,0 +1,115 @@
+"""Time spent importing the test modules and collecting their tests."""
+
+import sys
+
+from nosetimer import clock
+
+try:
+    import builtins
+except ImportError:  # pragma: no cover
+    import __builtin__ as builtins
+
+
+def _absolute_name(name, globals_, level):
+    """Resolve the name of a relative import."""
+    if level <= 0 or not globals_:
+        return name
+    package = globals_.get('__package__') or globals_.get('__name__', '')
+    if '__path__' not in globals_ and not globals_.get('__package__'):
+        package = package.rpartition('.')[0]
+    base = package.rsplit('.', level - 1)[0] if level > 1 else package
+    return '{0}.{1}'.format(base, name) if name else base
+
+
+class ImportTimer(object):
+    """Time the import and the collection of each test module.
+
+    nose imports a test module between the ``beforeImport`` and
+    ``afterImport`` hooks, during which ``__import__`` is wrapped to time the
+    modules it imports for the first time, including what they import in
+    turn, like ``python -X importtime``. The collection of its tests lasts
+    until the ``loadTestsFromModule`` hook, less the imports and collections
+    nested in it, as packages collect their subpackages.
+    """
+
+    def __init__(self):
+        self.modules = {}
+        self._original = None
+        self._start = None
+        self._modules_before = 0
+        self._dependencies = None
+        self._depth = 0
+        # (module, start, attributed) of the modules being collected
+        self._collecting = []
+        # time already attributed to an import or a collection
+        self._attributed = 0
+
+    def _record(self, module):
+        return self.modules.setdefault(module, {'import': 0.0, 'collect': 0.0, 'modules': 0, 'dependencies': {}})
+
+    def before_import(self, module):
+        self._dependencies = self._record(module)['dependencies']
+        self._modules_before = len(sys.modules)
+        self._original = builtins.__import__
+        builtins.__import__ = self._import
+        self._start = clock.now_ns()
+
+    def after_import(self, module):
+        now = clock.now_ns()
+        if builtins.__import__ == self._import:
+            builtins.__import__ = self._original
+        elapsed = now - self._start
+        self._attributed += elapsed
+        record = self._record(module)
+        record['import'] += clock.seconds(elapsed)
+        record['modules'] += len(sys.modules) - self._modules_before
+        # modules which failed to import are never collected
+        if module in sys.modules:
+            self._collecting.append((module, now, self._attributed))
+
+    def collected(self, module):
+        """Stop timing the collection of ``module``, once nose loaded its tests."""
+        for i in range(len(self._collecting) - 1, -1, -1):
+            if self._collecting[i][0] == module:
+                break
+        else:
+            # imported by nose without the import hooks
+            return
+        _, start, attributed = self._collecting[i]
+        del self._collecting[i:]
+        own = clock.now_ns() - start - (self._attributed - attributed)
+        self._attributed += own
+        self._record(module)['collect'] += clock.seconds(own)
+
+    def _import(self, name, globals=None, locals=None, fromlist=(), level=0):
+        before = len(sys.modules)
+        self._depth += 1
+        start = clock.now_ns()
+        try:
+            return self._original(name, globals, locals, fromlist, level)
+        finally:
+            elapsed = clock.now_ns() - start
+            self._depth -= 1
+            # only the modules imported by the test module itself, and for
+            # the first time, their cost includes their own imports
+            if self._depth == 0 and len(sys.modules) > before:
+                name = self._imported_name(name, globals, fromlist, level)
+                self._dependencies[name] = self._dependencies.get(name, 0.0) + clock.seconds(elapsed)
+
+    @staticmethod
+    def _imported_name(name, globals_, fromlist, level):
+        """Get the name of what an import statement imported, e.g. ``pkg.mod`` for ``from pkg import mod``."""
+        name = _absolute_name(name, globals_, level)
+        submodules = ['{0}.{1}'.format(name, item) for item in fromlist or ()
+                      if '{0}.{1}'.format(name, item) in sys.modules]
+        return ', '.join(submodules) if submodules else name
+
+    @property
+    def total(self):
+        """Get the time spent importing and collecting all test modules."""
+        return sum(record['import'] + record['collect'] for record in self.modules.values())
+
+    def slowest(self, limit=None):
+        """Get the ``(module, record)`` items, slowest first."""
+        modules = sorted(self.modules.items(), key=lambda item: item[1]['import'] + item[1]['collect'], reverse=True)
+        return modules[:limit] if limit is not None else modules
@@ -0,0 +1,115 @@
+"""Per-test memory measurements."""
+
+import os
+import sys
+
+try:
+    import resource
+except ImportError:  # pragma: no cover
+    resource = None
+
+try:
+    import tracemalloc
+except ImportError:  # pragma: no cover
+    tracemalloc = None
+
+try:
+    _PAGE_SIZE = os.sysconf('SC_PAGE_SIZE')
+except (AttributeError, ValueError, OSError):  # pragma: no cover
+    _PAGE_SIZE = 4096
+
+
+def max_rss():
+    """Get the peak RSS of the process since it started, in bytes."""
+    if resource is None:  # pragma: no cover
+        return 0
+    maxrss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # kilobytes on Linux, bytes on macOS
+    return maxrss if sys.platform == 'darwin' else maxrss * 1024
+
+
+def rss():
+    """Get the current RSS of the process, in bytes."""
+    try:
+        with open('/proc/self/statm') as f:
+            return int(f.read().split()[1]) * _PAGE_SIZE
+    except (IOError, OSError, ValueError, IndexError):  # pragma: no cover
+        return max_rss()
+
+
+def reset_peak_rss():
+    """Reset the peak RSS of the process, tell whether it is supported.
+
+    Only Linux (4.0+) allows it, through ``/proc/self/clear_refs``.
+    """
+    try:
+        with open('/proc/self/clear_refs', 'w') as f:
+            f.write('5')
+        return True
+    except (IOError, OSError):  # pragma: no cover
+        return False
+
+
+def peak_rss():
+    """Get the peak RSS of the process since the last reset, in bytes."""
+    try:
+        with open('/proc/self/status') as f:
+            for line in f:
+                if line.startswith('VmHWM:'):
+                    return int(line.split()[1]) * 1024
+    except (IOError, OSError, ValueError, IndexError):  # pragma: no cover
+        pass
+    return max_rss()  # pragma: no cover
+
+
+class MemoryTracker(object):
+    """Measure the RSS growth of a test, and its traced allocations.
+
+    ``traced_sites`` is the number of top allocation sites to report per test
+    using :mod:`tracemalloc`, which must be started beforehand; 0 disables
+    tracing.
+    """
+
+    def __init__(self, traced_sites=0):
+        self.traced_sites = traced_sites if tracemalloc is not None else 0
+        self._start = None
+
+    @staticmethod
+    def _snapshot():
+        # leave out what the snapshots themselves allocate
+        return tracemalloc.take_snapshot().filter_traces([tracemalloc.Filter(False, tracemalloc.__file__)])
+
+    def start(self):
+        snapshot = None
+        if self.traced_sites:
+            if hasattr(tracemalloc, 'reset_peak'):
+                tracemalloc.reset_peak()
+            snapshot = self._snapshot()
+        resettable = reset_peak_rss()
+        self._start = (rss(), resettable, None if resettable else max_rss(), snapshot)
+
+    def stop(self):
+        """Get the memory entry of the test started last."""
+        if self._start is None:
+            return {'memory': 0, 'rss_delta': 0}
+        start_rss, resettable, start_max_rss, snapshot = self._start
+        self._start = None
+        end_rss = rss()
+        if resettable:
+            growth = peak_rss() - start_rss
+        else:  # pragma: no cover
+            # without a resettable peak, only a new lifetime peak is telling
+            end_max_rss = max_rss()
+            growth = end_max_rss - start_rss if end_max_rss > start_max_rss else end_rss - start_rss
+        entry = {
+            'memory': max(growth, 0),
+            'rss_delta': end_rss - start_rss,
+        }
+        if snapshot is not None:
+            entry['traced_peak'] = tracemalloc.get_traced_memory()[1]
+            stats = self._snapshot().compare_to(snapshot, 'lineno')
+            entry['allocations'] = [
+                ['{0}:{1}'.format(s.traceback[0].filename, s.traceback[0].lineno), s.size_diff]
+                for s in stats[:self.traced_sites] if s.size_diff > 0
+            ]
+        return entry
@@ -2,78 +2,92 @@ import json
 import logging
 import os
 import re
-import timeit
+import sys
+import time
 
 from nose.plugins import Plugin
 
-try:
-    import Queue
-except ImportError:  # pragma: no cover
-    import queue as Queue
-
 from collections import OrderedDict
 
-try:
-    import termcolor
-except ImportError:  # pragma: no cover
-    termcolor = None  # noqa
+# imported by _import_features, once the plugin is enabled
+budgets = None
+clock = None
+export = None
+imports = None
+memory = None
+profiler = None
+progress = None
+scheduling = None
+stats = None
+trace = None
+watchdog = None
+ResultSpool = None
+
+# imported by _import_colors, once the output is known to be colored
+termcolor = None
+colorama = None
+TERMCOLOR2COLORAMA = {}
+_colors_imported = False
 
 try:
-    import colorama
-    TERMCOLOR2COLORAMA = {  # pragma: no cover
-        'green': colorama.Fore.GREEN,
-        'yellow': colorama.Fore.YELLOW,
-        'red': colorama.Fore.RED,
-    }
-except ImportError:
-    colorama = None
+    import resource
+except ImportError:  # pragma: no cover
+    resource = None
 
 # define constants
 IS_NT = os.name == 'nt'
 
-# Windows and Python 2.7 multiprocessing don't marry well.
-_results_queue = None
-if not IS_NT:
-    import multiprocessing
-    from multiprocessing import queues
-
-    class TimerQueue(queues.Queue):
-        """A portable implementation of multiprocessing.Queue.
-
-        Because of multithreading / multiprocessing semantics, Queue.qsize()
-        may raise the NotImplementedError exception on Unix platforms like
-        Mac OS X where sem_getvalue() is not implemented. This subclass
-        addresses this problem by using a synchronized shared counter
-        (initialized to zero) and increasing / decreasing its value every time
-        the put() and get() methods are called, respectively. This not only
-        prevents NotImplementedError from being raised, but also allows us to
-        implement a reliable version of both qsize() and empty().
-        """
+log = logging.getLogger('nose.plugin.timer')
 
-        def __init__(self, *args, **kwargs):
-            if hasattr(multiprocessing, 'get_context'):
-                kwargs.update(ctx=multiprocessing.get_context())
-            super(TimerQueue, self).__init__(*args, **kwargs)
-            self.size = multiprocessing.Value('i', 0)
 
-        def put(self, *args, **kwargs):
-            with self.size.get_lock():
-                self.size.value += 1
-            super(TimerQueue, self).put(*args, **kwargs)
+def _import_features():
+    """Import the modules of the features of the plugin.
 
-        def get(self, *args, **kwargs):
-            with self.size.get_lock():
-                self.size.value -= 1
-            return super(TimerQueue, self).get(*args, **kwargs)
+    nose imports every plugin on each run, so they are only imported when
+    the timer plugin is enabled.
+    """
+    global budgets, clock, export, imports, memory, profiler, progress, scheduling, stats, trace, watchdog
+    global ResultSpool
+    if clock is not None:
+        return
+    from nosetimer import budgets
+    from nosetimer import clock
+    from nosetimer import export
+    from nosetimer import imports
+    from nosetimer import memory
+    from nosetimer import profiler
+    from nosetimer import progress
+    from nosetimer import scheduling
+    from nosetimer import stats
+    from nosetimer import trace
+    from nosetimer import watchdog
+    from nosetimer.spool import ResultSpool
 
-        def qsize(self):
-            """Reliable implementation of multiprocessing.Queue.qsize()."""
-            return self.size.value
 
-    _results_queue = TimerQueue()
+def _import_colors():
+    """Import termcolor or colorama, if any of them are available.
 
+    nose imports every plugin on each run, so they are only imported when
+    the timer plugin is enabled with colors.
+    """
+    global termcolor, colorama, TERMCOLOR2COLORAMA, _colors_imported
+    if _colors_imported:
+        return
+    _colors_imported = True
+    try:
+        import termcolor
+    except ImportError:  # pragma: no cover
+        pass
 
-log = logging.getLogger('nose.plugin.timer')
+    try:
+        import colorama
+        TERMCOLOR2COLORAMA = {  # pragma: no cover
+            'green': colorama.Fore.GREEN,
+            'yellow': colorama.Fore.YELLOW,
+            'red': colorama.Fore.RED,
+        }
+    except ImportError:
+        pass
 
 
 def _colorize(val, color):
@@ -89,6 +103,31 @@ def _colorize(val, color):
     return val
 
 
+def _cpu_times():
+    """Get the user and system CPU time of the process, and the CPU time of
+    the current thread (``None`` where unavailable).
+    """
+    if resource is not None:
+        # microsecond resolution, os.times() is only as fine as clock ticks
+        usage = resource.getrusage(resource.RUSAGE_SELF)
+        user, system = usage.ru_utime, usage.ru_stime
+    else:  # pragma: no cover
+        user, system = os.times()[:2]
+    thread = time.thread_time() if hasattr(time, 'thread_time') else None
+    return user, system, thread
+
+
+def _timed(func, phases, phase):
+    """Wrap ``func`` to store its duration in ``phases[phase]``."""
+    def wrapper(*args, **kwargs):
+        start = clock.now_ns()
+        try:
+            return func(*args, **kwargs)
+        finally:
+            phases[phase] = clock.seconds(clock.now_ns() - start)
+    return wrapper
+
+
 class TimerPlugin(Plugin):
     """This plugin provides test timings."""
 
@@ -96,21 +135,56 @@ class TimerPlugin(Plugin):
     score = 1
 
     time_format = re.compile(r'^(?P<time>\d+\.?\d*)(?P<units>s|ms)?$')
+    size_format = re.compile(r'^(?P<size>\d+\.?\d*)(?P<units>B|KB|MB|GB)?$', re.IGNORECASE)
+    _SIZE_UNITS = {'b': 1, 'kb': 1 << 10, 'mb': 1 << 20, 'gb': 1 << 30}
     _timed_tests = {}
 
+    _PHASE_METHODS = (
+        ('setup', 'setUp'),
+        ('teardown', 'tearDown'),
+    )
+
     _COLOR_TO_FILTER = {
         'green': 'ok',
         'yellow': 'warning',
         'red': 'error',
     }
 
+    # slowest modules imported by each test module in the report
+    _IMPORTS_SHOWN = 3
+
     def __init__(self, *args, **kwargs):
         super(TimerPlugin, self).__init__(*args, **kwargs)
         self._threshold = None
+        self._spool = None
+        self._phases = {}
+        self._wrapped = []
+        self._fixture_times = {}
+        self._pending_setup = None
+        self._last_stop = None
+        self._registered = None
+        self._pending = None
+        self._jsonl = None
+        self._top = None
+        self._histograms = None
+        self._tree = None
+        self._imports = None
+        self._timeline = None
+        self._time_fixtures = False
+        self._calibration = None
+        self._budgets = None
+        self._watchdog = None
+        self._progress = None
+        self._skipped = None
+        self._overhead_ns = 0
+        self._cpu_start = None
+        self._memory = None
+        self._sampler = None
 
     def _time_taken(self):
         if hasattr(self, '_timer'):
-            taken = timeit.default_timer() - self._timer
+            # integer nanoseconds, so no precision is lost to a long uptime
+            taken = clock.seconds(max(clock.now_ns() - self._timer - self._overhead_ns, 0))
         else:
             # Test died before it ran (probably error in setup()) or
             # success/failure added before test started probably due to custom
@@ -135,6 +209,26 @@ class TimerPlugin(Plugin):
                 time *= 1000
             return time
 
+    def _parse_size(self, value):
+        """Parse string size representation to get number of bytes.
+        Raises the ``ValueError`` for invalid format.
+        """
+        m = self.size_format.match(str(value))
+        if not m:
+            raise ValueError("Could not parse size represented by '{s}'".format(s=value))
+        # Default size unit is a megabyte.
+        return int(float(m.group('size')) * self._SIZE_UNITS[(m.group('units') or 'mb').lower()])
+
+    @staticmethod
+    def _parse_shard(value):
+        """Parse a ``K/N`` shard, get the ``(K, N)`` tuple.
+        Raises the ``ValueError`` for invalid format.
+        """
+        m = re.match(r'^(\d+)/(\d+)$', str(value))
+        if not m or not 1 <= int(m.group(1)) <= int(m.group(2)):
+            raise ValueError("Could not parse shard represented by '{s}'".format(s=value))
+        return int(m.group(1)), int(m.group(2))
+
     @staticmethod
     def _parse_filter(value):
         """Parse timer filters."""
@@ -145,48 +239,368 @@ class TimerPlugin(Plugin):
         super(TimerPlugin, self).configure(options, config)
         self.config = config
         if self.enabled:
+            _import_features()
             self.timer_top_n = int(options.timer_top_n)
             self.timer_ok = self._parse_time(options.timer_ok)
             self.timer_warning = self._parse_time(options.timer_warning)
             self.timer_filter = self._parse_filter(options.timer_filter)
             self.timer_fail = options.timer_fail
+            self.timer_repeat = int(options.timer_repeat)
+            if options.timer_timeout is not None:
+                self._watchdog = watchdog.Watchdog(self._parse_time(options.timer_timeout) / 1000.0)
+            rules = budgets.read_rules(options.timer_budget_file) if options.timer_budget_file else ()
+            self._budgets = budgets.Budgets(self._parse_time, rules)
 
             # Windows + nosetests does not support colors (even with colorama).
             self.timer_no_color = options.timer_no_color if not IS_NT else True
+            if not self.timer_no_color:
+                _import_colors()
             self.json_file = options.json_file
+            self.timer_durations_file = options.timer_durations_file
+            self.jsonl_file = options.jsonl_file
+            self.binary_file = options.binary_file
+            self.timer_history_file = options.timer_history_file
+            self.timer_history_window = int(options.timer_history_window)
+            self.timer_schedule = options.timer_schedule
+            self.timer_order = options.timer_order
+            self.timer_progress_file = options.timer_progress_file
+            self.timer_progress = options.timer_progress or bool(self.timer_progress_file)
+            if options.timer_calibrate:
+                self._calibration = clock.Calibration.measure()
+                self._overhead_ns = self._calibration.overhead_ns
+            self.timer_shard = None
+            if options.timer_shard is not None:
+                self.timer_shard = self._parse_shard(options.timer_shard)
+            self.timer_budget = None
+            if options.timer_budget is not None:
+                self.timer_budget = self._parse_time(options.timer_budget) / 1000.0
+            self.timer_phases = options.timer_phases
+            self.timer_cpu = options.timer_cpu
+            self.timer_memory_fail = None
+            if options.timer_memory_fail is not None:
+                self.timer_memory_fail = self._parse_size(options.timer_memory_fail)
+            self.timer_tracemalloc = int(options.timer_tracemalloc)
+            if options.timer_memory or self.timer_memory_fail is not None or self.timer_tracemalloc:
+                self._memory = memory.MemoryTracker(self.timer_tracemalloc)
+            self.timer_profile_dir = options.timer_profile_dir
+            if self.timer_profile_dir:
+                if not os.path.isdir(self.timer_profile_dir):
+                    os.makedirs(self.timer_profile_dir)
+                self._sampler = profiler.StackSampler()
+            if options.timer_histogram:
+                self._histograms = OrderedDict()
+            if options.timer_tree:
+                self._tree = stats.TimingTree()
+            # workers import their tests again, only the main process reports
+            if options.timer_imports and not getattr(config, 'worker', False):
+                self._imports = imports.ImportTimer()
+            if options.timer_bounded_memory:
+                if self.timer_top_n > 0:
+                    self._top = stats.TopN(self.timer_top_n)
+                else:
+                    log.warning("--timer-bounded-memory requires a positive --timer-top-n, ignoring it")
 
             # determine if multiprocessing plugin enabled
-            self.multiprocessing_enabled = bool(getattr(options, 'multiprocess_workers', False))
+            # nose keeps --processes as a string, and '0' runs in this process
+            try:
+                workers = int(getattr(options, 'multiprocess_workers', 0) or 0)
+            except (TypeError, ValueError):
+                workers = 0
+            self.multiprocessing_enabled = workers != 0
+            if self.multiprocessing_enabled:
+                # workers are configured with a pickled copy of the config
+                spool_dir = getattr(config, 'timer_spool_dir', None)
+                if spool_dir is None:
+                    self._spool = ResultSpool.create()
+                    if config is not None:
+                        config.timer_spool_dir = self._spool.path
+                else:
+                    self._spool = ResultSpool(spool_dir)
+
+            self.timer_trace_file = options.timer_trace_file
+            # the tests of each process are laid out in time to report the
+            # utilization of the workers
+            if self.timer_trace_file or self.multiprocessing_enabled:
+                self._timeline = trace.Timeline()
+            self._time_fixtures = bool(self.timer_phases or self.timer_trace_file)
+
+    def _open_history(self):
+        """Open the --timer-history-file, sqlite3 is only imported when it is set."""
+        from nosetimer.history import TimingHistory
+        return TimingHistory(self.timer_history_file, self.timer_history_window)
+
+    def _previous_timings(self):
+        """Get the test durations recorded by the previous runs, and the tests that failed last."""
+        if self.timer_durations_file:
+            # read only, unlike the files this run saves its own timings to
+            timed_tests = export.read_json(self.timer_durations_file)
+            return export.durations(timed_tests), export.failures(timed_tests)
+        if self.timer_history_file:
+            history = self._open_history()
+            try:
+                return history.durations(), history.failures()
+            finally:
+                history.close()
+        if self.json_file and os.path.exists(self.json_file):
+            try:
+                timed_tests = export.read_json(self.json_file)
+                return export.durations(timed_tests), export.failures(timed_tests)
+            except (ValueError, KeyError):
+                log.warning("Could not read previous timings from '%s'", self.json_file)
+        return {}, set()
+
+    def _failure_rates(self, failures):
+        """Get how often each test failed over the --timer-history-file window, or else in the last run.
+
+        The --timer-durations-file, if set, is the last run.
+        """
+        if self.timer_durations_file or not self.timer_history_file:
+            return dict((test_id, 1.0) for test_id in failures)
+        history = self._open_history()
+        try:
+            return history.failure_rates()
+        finally:
+            history.close()
+
+    def begin(self):
+        """Called before any test is collected or run."""
+        # workers call begin() too, only the main process starts a new file
+        if self.enabled and self.jsonl_file and not getattr(self.config, 'worker', False):
+            export.JsonLinesWriter.truncate(self.jsonl_file)
+        if self._memory is not None and self._memory.traced_sites and not memory.tracemalloc.is_tracing():
+            memory.tracemalloc.start()
+
+    def _stream_record(self, record):
+        """Append a test record to the --timer-jsonl-file export."""
+        if self._jsonl is None:
+            self._jsonl = export.JsonLinesWriter(self.jsonl_file)
+            # flush what is left once the process (possibly a worker) exits
+            from multiprocessing import util as multiprocessing_util
+            multiprocessing_util.Finalize(self._jsonl, self._jsonl.close, exitpriority=10)
+        self._jsonl.write(record)
+
+    def finalize(self, result):
+        """Called after all report output, including output from all plugins."""
+        self._hand_over()
+        if self._jsonl is not None:
+            self._jsonl.close()
+        if self._sampler is not None:
+            self._sampler.close()
+        if self._progress is not None:
+            self._close_progress()
+
+    def prepareTest(self, test):
+        """Keep the tests of the shard fitting in the budget, reorder them from the previous runs."""
+        schedule = self.timer_schedule and self.multiprocessing_enabled
+        if not (self.enabled and (self.timer_shard or self.timer_budget is not None or self.timer_order
+                                  or schedule or self.timer_progress)):
+            return None
+
+        durations, failures = self._previous_timings()
+        prepared = None
+        if self.timer_shard:
+            k, n = self.timer_shard
+            # without any durations, every test counts the same, which
+            # balances the number of tests
+            index = scheduling.DurationIndex(durations, default=None if durations else 1.0)
+            prepared = test = scheduling.shard(test, index, k, n)
+        if self.timer_budget is not None:
+            if durations:
+                test, self._skipped = scheduling.select(
+                    test, durations, self._failure_rates(failures), self.timer_budget)
+                prepared = test
+            else:
+                log.warning("No previous timings to select the tests fitting in --timer-budget, running them all")
+        if self.timer_order and (durations or failures):
+            index = scheduling.DurationIndex(durations)
+            prepared = test = scheduling.reorder(test, index, failures, longest=self.timer_order == 'longest')
+        if schedule and durations:
+            prepared = test = scheduling.longest_first(test, scheduling.DurationIndex(durations))
+        if self.timer_progress:
+            prepared = test = self._start_progress(test, durations)
+        return prepared
+
+    def _start_progress(self, test, durations):
+        """Start the live progress of the run of ``test``."""
+        test, expected = scheduling.predict(test, scheduling.DurationIndex(durations))
+        follow = self._spool.follow if self.multiprocessing_enabled else None
+        stream, verbosity = sys.stderr, getattr(self.config, 'verbosity', 1)
+        if self.timer_progress_file:
+            # nose writes nothing there, so the line can stay live
+            stream, verbosity = open(self.timer_progress_file, 'w'), 0
+        # the main process of a multiprocess run has no test to print it between
+        live = True if self.multiprocessing_enabled else None
+        self._progress = progress.Progress(stream, durations, expected, follow, verbosity, live)
+        self._progress.start()
+        return test
+
+    def _close_progress(self):
+        """Stop the live progress, close the --timer-progress-file."""
+        self._progress.close()
+        if self.timer_progress_file:
+            self._progress.stream.close()
+
+    def _add_fixture_time(self, context, phase, start, end):
+        name = scheduling.context_id(context)
+        span = None
+        if self._timeline is not None:
+            span = {'span': name, 'phase': phase, 'pid': os.getpid(),
+                    'start': clock.timestamp(start), 'end': clock.timestamp(end)}
+        if self.multiprocessing_enabled:
+            if self.timer_phases:
+                self._spool.put({'fixture': name, phase: clock.seconds(end - start)})
+            if span is not None:
+                self._spool.put(span)
+            return
+        if span is not None:
+            self._timeline.add_span(span)
+        if self.timer_phases:
+            times = self._fixture_times.setdefault(name, {'setup': 0.0, 'teardown': 0.0})
+            times[phase] += clock.seconds(end - start)
+
+    def _end_setup(self, now):
+        """Stop timing the setup of the last started context."""
+        if self._pending_setup is not None:
+            context, start = self._pending_setup
+            self._pending_setup = None
+            self._add_fixture_time(context, 'setup', start, now)
+
+    def beforeImport(self, filename, module):
+        """Called before a test module is imported."""
+        if self._imports is not None:
+            self._imports.before_import(module)
+
+    def afterImport(self, filename, module):
+        """Called after a test module is imported, even if the import failed."""
+        if self._imports is not None:
+            self._imports.after_import(module)
+
+    def loadTestsFromModule(self, module, path=None):
+        """Called once nose collected the tests of a module."""
+        if self._imports is not None:
+            self._imports.collected(module.__name__)
+
+    def startContext(self, context):
+        """Called before the module or class fixtures are set up."""
+        if self.enabled and self._time_fixtures:
+            now = clock.now_ns()
+            self._end_setup(now)
+            self._pending_setup = (context, now)
+
+    def stopContext(self, context):
+        """Called after the module or class fixtures are torn down."""
+        if self.enabled and self._time_fixtures:
+            now = clock.now_ns()
+            self._end_setup(now)
+            if self._last_stop is not None:
+                self._add_fixture_time(context, 'teardown', self._last_stop, now)
+            self._last_stop = now
 
     def startTest(self, test):
         """Initializes a timer before starting a test."""
-        self._timer = timeit.default_timer()
+        if self.enabled and self._time_fixtures:
+            self._end_setup(clock.now_ns())
+        if self.enabled and self.timer_phases:
+            self._time_phases(test)
+        if self._memory is not None:
+            self._memory.start()
+        if self.enabled and self.timer_cpu:
+            self._cpu_start = _cpu_times()
+        if self._sampler is not None:
+            self._sampler.start()
+        if self._watchdog is not None:
+            self._watchdog.start()
+        if self._progress is not None:
+            # nose is yet to write anything about this test
+            self._progress.tick()
+            self._progress.start_test(test.id())
+        self._registered = None
+        self._timer = clock.now_ns()
+
+    def stopTest(self, test):
+        """Called after a test is run."""
+        if self._watchdog is not None:
+            self._watchdog.cancel()
+        if self.enabled and self.timer_phases:
+            for case, name in self._wrapped:
+                case.__dict__.pop(name, None)
+            self._wrapped = []
+        if self.enabled and self._time_fixtures:
+            self._last_stop = clock.now_ns()
+
+    def afterTest(self, test):
+        """Called once the test is over, including the error addSuccess may raise."""
+        self._hand_over()
+
+    def _time_phases(self, test):
+        """Time the setUp and tearDown methods of the test case."""
+        case = getattr(test, 'test', test)
+        self._phases = {}
+        for phase, name in self._PHASE_METHODS:
+            method = getattr(case, name, None)
+            if method is not None:
+                setattr(case, name, _timed(method, self._phases, phase))
+                self._wrapped.append((case, name))
 
     def report(self, stream):
         """Report the test times."""
         if not self.enabled:
             return
 
-        # if multiprocessing plugin enabled - get items from results queue
+        # in case the last test got no afterTest
+        self._hand_over()
+
+        if self._progress is not None:
+            self._close_progress()
+
+        # if multiprocessing plugin enabled - merge the results of the workers
         if self.multiprocessing_enabled:
-            for i in range(_results_queue.qsize()):
-                try:
-                    k, v, s = _results_queue.get(False)
-                    self._timed_tests[k] = {
-                        'time': v,
-                        'status': s,
-                    }
-                except Queue.Empty:
-                    pass
-
-        d = sorted(self._timed_tests.items(), key=lambda item: item[1]['time'], reverse=True)
+            for record in self._spool:
+                if 'span' in record:
+                    self._timeline.add_span(record)
+                elif 'fixture' in record:
+                    times = self._fixture_times.setdefault(record.pop('fixture'), {'setup': 0.0, 'teardown': 0.0})
+                    for phase, time_taken in record.items():
+                        times[phase] += time_taken
+                else:
+                    test_id = record.pop('id')
+                    self._collect(test_id, record)
+                    if self._top is None:
+                        self._timed_tests[test_id] = record
+            self._spool.close()
+
+        if self._tree is not None:
+            for name, times in self._fixture_times.items():
+                self._tree.add_self(name, times['setup'] + times['teardown'])
+
+        if self._calibration is not None:
+            stream.writeln("Timer: resolution {0}, overhead {1} subtracted, uncertainty {2}".format(
+                stats.format_duration(clock.seconds(self._calibration.resolution_ns)),
+                stats.format_duration(clock.seconds(self._calibration.overhead_ns)),
+                stats.format_duration(clock.seconds(self._calibration.uncertainty_ns)),
+            ))
+
+        if self._top is not None:
+            d = self._top.items()
+            total_time = self._top.total
+        else:
+            d = sorted(self._timed_tests.items(), key=lambda item: item[1]['time'], reverse=True)
+            total_time = sum([vv['time'] for kk, vv in d])
 
         if self.json_file:
             dict_type = OrderedDict if self.timer_top_n else dict
+            data = {'tests': dict_type((k, v) for k, v in d)}
+            if self.timer_phases:
+                data['fixtures'] = self._fixture_times
+            if self._tree is not None:
+                data['tree'] = self._tree.to_dict()
+            if self._imports is not None:
+                data['imports'] = self._imports.modules
             with open(self.json_file, 'w') as f:
-                json.dump({'tests': dict_type((k, v) for k, v in d)}, f)
+                json.dump(data, f)
 
-        total_time = sum([vv['time'] for kk, vv in d])
+        if self.binary_file:
+            export.write_binary(self.binary_file, d)
 
         for i, (test, time_and_status) in enumerate(d):
             time_taken = time_and_status['time']
@@ -200,11 +614,163 @@ class TimerPlugin(Plugin):
                     color=color,
                     status=status,
                     percent=percent,
+                    details=time_and_status,
                 )
                 _filter = self._COLOR_TO_FILTER.get(color)
                 if self.timer_filter is None or _filter is None or _filter in self.timer_filter:
                     stream.writeln(line)
 
+        if self.timer_phases and self._fixture_times:
+            self._report_fixtures(stream)
+
+        if self._tree is not None and self._tree.count:
+            self._report_tree(stream)
+
+        if self._imports is not None and self._imports.modules:
+            self._report_imports(stream)
+
+        if self._timeline is not None and self._timeline.tests:
+            if self.multiprocessing_enabled:
+                self._report_workers(stream)
+            if self.timer_trace_file:
+                self._timeline.write_trace(self.timer_trace_file)
+
+        if self._histograms:
+            self._report_histograms(stream)
+
+        if self._skipped:
+            self._report_skipped(stream)
+
+        if self.timer_history_file:
+            self._report_history(stream, d)
+
+    def _report_skipped(self, stream):
+        """Report the tests left out of the --timer-budget selection, longest first."""
+        skipped = sorted(self._skipped, key=lambda item: item[1], reverse=True)
+        stream.writeln("Skipped to fit in {0}: {1} tests or suites, {2} predicted".format(
+            self._colored_time(self.timer_budget),
+            len(skipped),
+            self._colored_time(sum(time_taken for _, time_taken in skipped)),
+        ))
+        if self.timer_top_n != -1:
+            skipped = skipped[:self.timer_top_n]
+        for test_id, time_taken in skipped:
+            stream.writeln("{0}: {1}".format(test_id, self._colored_time(time_taken)))
+
+    def _report_fixtures(self, stream):
+        """Report the time spent in module and class fixtures."""
+        fixtures = sorted(self._fixture_times.items(), key=lambda item: sum(item[1].values()), reverse=True)
+        if self.timer_top_n != -1:
+            fixtures = fixtures[:self.timer_top_n]
+
+        stream.writeln("Fixtures:")
+        for context, times in fixtures:
+            time_taken = times['setup'] + times['teardown']
+            stream.writeln("{0}: {1} (setup {2}, teardown {3})".format(
+                context,
+                self._colored_time(time_taken, self._get_result_color(time_taken)),
+                self._colored_time(times['setup']),
+                self._colored_time(times['teardown']),
+            ))
+
+    def _report_tree(self, stream):
+        """Report the time spent per package, module and class."""
+        limit = None if self.timer_top_n == -1 else self.timer_top_n
+        total_time = self._tree.total
+        stream.writeln("Tree:")
+        for depth, name, node in self._tree.walk(limit):
+            percent = 0 if total_time == 0 else node.total / total_time * 100
+            stream.writeln("{0}{1}: {2} ({3:0.2f}%, {4} tests, self {5})".format(
+                '  ' * depth,
+                name,
+                self._colored_time(node.total),
+                percent,
+                node.count,
+                self._colored_time(node.self_time),
+            ))
+
+    def _report_imports(self, stream):
+        """Report the time spent importing the test modules and collecting their tests."""
+        limit = None if self.timer_top_n == -1 else self.timer_top_n
+        stream.writeln("Imports:")
+        for module, record in self._imports.slowest(limit):
+            time_taken = record['import'] + record['collect']
+            stream.writeln("{0}: {1} (import {2}, collect {3}, {4} new modules)".format(
+                module,
+                self._colored_time(time_taken, self._get_result_color(time_taken)),
+                self._colored_time(record['import']),
+                self._colored_time(record['collect']),
+                record['modules'],
+            ))
+            dependencies = sorted(record['dependencies'].items(), key=lambda item: item[1], reverse=True)
+            for name, dependency_time in dependencies[:self._IMPORTS_SHOWN]:
+                stream.writeln("  {0}: {1}".format(name, self._colored_time(dependency_time)))
+        stream.writeln("Total: {0} ({1} modules)".format(
+            self._colored_time(self._imports.total), len(self._imports.modules)))
+
+    def _report_workers(self, stream):
+        """Report how busy each multiprocess worker was."""
+        start, end = self._timeline.bounds()
+        workers = self._timeline.workers()
+        wall = end - start
+        busy = sum(worker[2] for worker in workers)
+        stream.writeln("Workers: {0} processes over {1}, {2:0.2f}% utilized".format(
+            len(workers),
+            self._colored_time(wall),
+            0 if wall == 0 else busy / (wall * len(workers)) * 100,
+        ))
+        for pid, tests, busy, finished in workers:
+            stream.writeln("pid {0}: {1} tests, busy {2} ({3:0.2f}%), idle {4}, finished at {5}".format(
+                pid,
+                tests,
+                self._colored_time(busy),
+                0 if wall == 0 else busy / wall * 100,
+                self._colored_time(max(wall - busy, 0.0)),
+                self._colored_time(finished - start),
+            ))
+
+    def _report_histograms(self, stream):
+        """Report the distribution of the test durations."""
+        stream.writeln("Duration distribution:")
+        for key, histogram in self._histograms.items():
+            stream.writeln("{0}: {1} tests, p50 {2}, p90 {3}, p99 {4}, max {5}".format(
+                key,
+                histogram.count,
+                stats.format_duration(histogram.quantile(50)),
+                stats.format_duration(histogram.quantile(90)),
+                stats.format_duration(histogram.quantile(99)),
+                stats.format_duration(histogram.max),
+            ))
+
+        rows = self._histograms['all'].rows()
+        largest = max(count for _, count in rows)
+        for bound, count in rows:
+            bar = '#' * int(round(40.0 * count / largest))
+            stream.writeln("{0:>8} |{1:<40}| {2}".format(stats.format_duration(bound), bar, count))
+
+    def _report_history(self, stream, d):
+        """Record this run in the history and report timing regressions."""
+        history = self._open_history()
+        try:
+            baselines = history.baselines()
+            history.record(d)
+        finally:
+            history.close()
+
+        regressions = history.regressions(d, baselines)
+        if not regressions:
+            return
+
+        stream.writeln("Timing regressions (compared to the last {0} runs):".format(self.timer_history_window))
+        for test, time_taken, status, baseline in regressions:
+            stream.writeln("[{0}] {1}: {2} (median {3}, p95 {4})".format(
+                status,
+                test,
+                self._colored_time(time_taken, 'red'),
+                self._colored_time(baseline.median),
+                self._colored_time(baseline.p95),
+            ))
+
     def _get_result_color(self, time_taken):
         """Get time taken result color."""
         time_taken_ms = time_taken * 1000
@@ -227,31 +793,191 @@ class TimerPlugin(Plugin):
             }[self.timer_fail]
         return self._threshold
 
+    def _time_limit(self, test):
+        """Get the time a test may take in milliseconds: its budget, else the --timer-fail threshold."""
+        limit = self._budgets.get(test.id(), getattr(test, 'test', test))
+        if limit is None and self.timer_fail is not None:
+            limit = self.threshold
+        return limit
+
     def _colored_time(self, time_taken, color=None):
         """Get formatted and colored string for a given time taken."""
         val = "{0:0.4f}s".format(time_taken)
         return val if self.timer_no_color or color is None else _colorize(val, color)
 
-    def _format_report_line(self, test, time_taken, color, status, percent):
+    def _format_report_line(self, test, time_taken, color, status, percent, details=None):
         """Format a single report line."""
-        return "[{0}] {3:04.2f}% {1}: {2}".format(
+        line = "[{0}] {3:04.2f}% {1}: {2}".format(
             status, test, self._colored_time(time_taken, color), percent
         )
+        if details is not None and 'call' in details:
+            line += " (setup {0}, call {1}, teardown {2})".format(
+                self._colored_time(details['setup']),
+                self._colored_time(details['call']),
+                self._colored_time(details['teardown']),
+            )
+        if details is not None and 'cpu' in details:
+            line += " (cpu {0}, wait {1})".format(
+                self._colored_time(details['cpu']),
+                self._colored_time(details['wait']),
+            )
+        if details is not None and 'memory' in details:
+            retained = details['rss_delta']
+            line += " (memory +{0} peak, {1}{2} retained)".format(
+                stats.format_size(details['memory']),
+                '+' if retained >= 0 else '',
+                stats.format_size(retained),
+            )
+            for site, size in details.get('allocations', ()):
+                line += "\n    +{0} {1}".format(stats.format_size(size), site)
+        if details is not None and 'runs' in details:
+            line += " (median of {0} runs, min {1}, stdev {2})".format(
+                details['runs'],
+                self._colored_time(details['min']),
+                self._colored_time(details['stdev']),
+            )
+        if details is not None and 'profile' in details:
+            line += " (profile {0})".format(details['profile'])
+        return line
 
-    def _register_time(self, test, status=None):
-        time_taken = self._time_taken()
-        if self.multiprocessing_enabled:
-            _results_queue.put((test.id(), time_taken, status))
+    def _cpu_taken(self, time_taken):
+        """Get the CPU and wait times of the test, out of its wall time."""
+        if self._cpu_start is None:
+            return {'cpu': 0.0, 'user': 0.0, 'sys': 0.0, 'wait': 0.0}
+        user, system, thread = _cpu_times()
+        start_user, start_system, start_thread = self._cpu_start
+        self._cpu_start = None
+        taken = {
+            'user': user - start_user,
+            'sys': system - start_system,
+        }
+        taken['cpu'] = taken['user'] + taken['sys']
+        # threads of the test may burn more CPU than wall time
+        taken['wait'] = max(time_taken - taken['cpu'], 0.0)
+        if thread is not None:
+            taken['thread'] = thread - start_thread
+        return taken
 
-        self._timed_tests[test.id()] = {
+    def _register_time(self, test, status=None, repeat=False):
+        if test.id() == self._registered:
+            # failed by addSuccess: the test is already timed, only hand it
+            # over with its final status
+            entry = self._timed_tests[test.id()]
+            entry['status'] = status
+            self._hand_over()
+            return entry['time']
+        self._hand_over()
+        self._registered = test.id()
+        time_taken = self._time_taken()
+        if self._watchdog is not None:
+            self._watchdog.cancel()
+        entry = {
             'time': time_taken,
             'status': status,
         }
+        if self.timer_phases:
+            setup = self._phases.get('setup', 0.0)
+            teardown = self._phases.get('teardown', 0.0)
+            entry.update(
+                setup=setup,
+                call=max(time_taken - setup - teardown, 0.0),
+                teardown=teardown,
+            )
+            self._phases = {}
+        if self.timer_cpu:
+            entry.update(self._cpu_taken(time_taken))
+        if self._memory is not None:
+            entry.update(self._memory.stop())
+        if self._sampler is not None:
+            samples = self._sampler.stop()
+            # only slow tests are worth a profile
+            if samples and self._get_result_color(time_taken) == 'red':
+                entry['profile'] = profiler.write_folded(self.timer_profile_dir, test.id(), samples)
+        limit = self._time_limit(test) if repeat and self.timer_repeat else None
+        if limit is not None and time_taken * 1000.0 > limit:
+            entry.update(self._repeat(test, time_taken))
+            time_taken = entry['time']
+        if self._timeline is not None and hasattr(self, '_timer'):
+            # the worker was busy with the reruns too
+            entry.update(
+                pid=os.getpid(),
+                start=clock.timestamp(self._timer),
+                end=clock.timestamp(clock.now_ns()),
+            )
+
+        self._pending = (test.id(), entry)
+        if self._top is not None:
+            # only the last test is kept around, for prepareTestResult
+            self._timed_tests.clear()
+        self._timed_tests[test.id()] = entry
+        # addSuccess may still fail the test, then it is handed over by
+        # addError or addFailure, else by afterTest
+        if status != 'success':
+            self._hand_over()
         return time_taken
 
+    def _hand_over(self):
+        """Hand the last registered test over to the aggregates, the spool and the exports."""
+        if self._pending is None:
+            return
+        test_id, entry = self._pending
+        self._pending = None
+        if self.multiprocessing_enabled or self.jsonl_file:
+            record = {'id': test_id}
+            record.update(entry)
+            if self.multiprocessing_enabled:
+                self._spool.put(record)
+            if self.jsonl_file:
+                self._stream_record(record)
+
+        if not self.multiprocessing_enabled:
+            self._collect(test_id, entry)
+            if self._progress is not None:
+                self._progress.add(test_id, entry['time'])
+
+    def _repeat(self, test, time_taken):
+        """Rerun a slow test, get the ``time`` (median) and spread of all its runs."""
+        case = getattr(test, 'test', test)
+        times = [time_taken]
+        for _ in range(self.timer_repeat):
+            start = clock.now_ns()
+            try:
+                case.debug()
+            except Exception:
+                log.warning("Could not repeat %s, it failed", test.id(), exc_info=True)
+                break
+            times.append(clock.seconds(clock.now_ns() - start))
+        times.sort()
+        return {
+            'time': stats.median(times),
+            'min': times[0],
+            'stdev': stats.stdev(times),
+            'runs': len(times),
+        }
+
+    def _collect(self, test_id, entry):
+        """Feed a test result to the streaming report aggregates."""
+        if self._timeline is not None:
+            self._timeline.add_test(test_id, entry)
+        if self._top is not None:
+            self._top.push(test_id, entry['time'], entry)
+        if self._tree is not None:
+            self._tree.add(test_id, entry['time'])
+        if self._histograms is not None:
+            package = str(test_id).partition('.')[0]
+            for key in ('all', '[{0}]'.format(entry['status']), package):
+                self._histogram(key).add(entry['time'])
+
+    def _histogram(self, key):
+        histogram = self._histograms.get(key)
+        if histogram is None:
+            histogram = self._histograms[key] = stats.LogHistogram()
+        return histogram
+
     def addError(self, test, err, capt=None):
         """Called when a test raises an uncaught exception."""
-        self._register_time(test, 'error')
+        timed_out = err is not None and isinstance(err[0], type) and issubclass(err[0], watchdog.TestTimeout)
+        self._register_time(test, 'timeout' if timed_out else 'error')
 
     def addFailure(self, test, err, capt=None, tb_info=None):
         """Called when a test fails."""
@@ -259,10 +985,16 @@ class TimerPlugin(Plugin):
 
     def addSuccess(self, test, capt=None):
         """Called when a test passes."""
-        time_taken = self._register_time(test, 'success')
-        if self.timer_fail is not None and time_taken * 1000.0 > self.threshold:
+        time_taken = self._register_time(test, 'success', repeat=True)
+        limit = self._time_limit(test)
+        if limit is not None and time_taken * 1000.0 > limit:
             test.fail('Test was too slow (took {0:0.4f}s, threshold was '
-                      '{1:0.4f}s)'.format(time_taken, self.threshold / 1000.0))
+                      '{1:0.4f}s)'.format(time_taken, limit / 1000.0))
+        if self.timer_memory_fail is not None:
+            used = self._timed_tests[test.id()]['memory']
+            if used > self.timer_memory_fail:
+                test.fail('Test used too much memory (peak grew by {0}, threshold was '
+                          '{1})'.format(stats.format_size(used), stats.format_size(self.timer_memory_fail)))
 
     def prepareTestResult(self, result):
         """Called before the first test is run."""
@@ -310,6 +1042,326 @@ class TimerPlugin(Plugin):
             ),
         )
 
+        # timings of the previous runs
+        parser.add_option(
+            "--timer-durations-file",
+            action="store",
+            default=None,
+            dest="timer_durations_file",
+            help=(
+                "Take the previous timings used to schedule, shard, select "
+                "and follow the tests from said Json file, as saved by "
+                "--timer-json-file, instead of the files this run saves to. "
+                "It is never written, so it can be shared by all the shards."
+            ),
+        )
+
+        # timer history
+        parser.add_option(
+            "--timer-history-file",
+            action="store",
+            default=None,
+            dest="timer_history_file",
+            help=(
+                "Append the timing of each test to said SQLite file and "
+                "report tests that got significantly slower than their "
+                "baseline."
+            ),
+        )
+
+        parser.add_option(
+            "--timer-history-window",
+            action="store",
+            default="20",
+            dest="timer_history_window",
+            help=(
+                "Number of previous runs used to compute the per-test "
+                "baselines of --timer-history-file. The default is 20."
+            ),
+        )
+
+        # timer schedule
+        parser.add_option(
+            "--timer-schedule",
+            action="store_true",
+            default=False,
+            dest="timer_schedule",
+            help=(
+                "Hand the tests out to the multiprocess workers longest "
+                "first, using the timings recorded by --timer-history-file "
+                "or a previous --timer-json-file."
+            ),
+        )
+
+        # timer calibrate
+        parser.add_option(
+            "--timer-calibrate",
+            action="store_true",
+            default=False,
+            dest="timer_calibrate",
+            help=(
+                "Measure the overhead of timing a test at startup and "
+                "subtract it from the test times, which matters for tests "
+                "running in microseconds."
+            ),
+        )
+
+        # timer progress
+        parser.add_option(
+            "--timer-progress",
+            action="store_true",
+            default=False,
+            dest="timer_progress",
+            help=(
+                "Show the progress of the run and the time left, as predicted "
+                "by --timer-history-file or the previous --timer-json-file "
+                "export, along with the running test."
+            ),
+        )
+
+        parser.add_option(
+            "--timer-progress-file",
+            action="store",
+            default=None,
+            dest="timer_progress_file",
+            help=(
+                "Write the --timer-progress line to said file instead of "
+                "stderr, e.g. /dev/tty or a file to follow, where it stays "
+                "live whatever the verbosity of nose. Implies --timer-progress."
+            ),
+        )
+
+        # timer budget
+        parser.add_option(
+            "--timer-budget",
+            action="store",
+            default=None,
+            dest="timer_budget",
+            help=(
+                "Only run the tests most likely to fail that fit in said "
+                "total time, as predicted by --timer-history-file or the "
+                "previous --timer-json-file export, and report the skipped "
+                "ones. Tests never timed count as likely to fail. Not to be "
+                "confused with the per-test --timer-budget-file. Default time "
+                "unit is a second."
+            ),
+        )
+
+        # timer order
+        parser.add_option(
+            "--timer-order",
+            action="store",
+            type="choice",
+            choices=["longest", "shortest"],
+            default=None,
+            dest="timer_order",
+            help=(
+                "Run the tests that failed last time first, then the others "
+                "'longest' or 'shortest' first, as recorded by "
+                "--timer-history-file or the previous --timer-json-file export."
+            ),
+        )
+
+        # timer shard
+        parser.add_option(
+            "--timer-shard",
+            action="store",
+            default=None,
+            dest="timer_shard",
+            metavar="K/N",
+            help=(
+                "Only run the K-th of N shards of near-equal durations, as "
+                "predicted by --timer-durations-file, --timer-history-file or "
+                "the previous --timer-json-file export. Suites with fixtures "
+                "are kept whole."
+            ),
+        )
+
+        # timer phases
+        parser.add_option(
+            "--timer-phases",
+            action="store_true",
+            default=False,
+            dest="timer_phases",
+            help=(
+                "Split the time of each test into setup, call and teardown, "
+                "and report the time spent in module and class fixtures."
+            ),
+        )
+
+        parser.add_option(
+            "--timer-jsonl-file",
+            action="store",
+            default=None,
+            dest="jsonl_file",
+            help=(
+                "Stream the timing and status of each test to said JSON "
+                "Lines file while the tests run, one record per line."
+            ),
+        )
+
+        parser.add_option(
+            "--timer-binary-file",
+            action="store",
+            default=None,
+            dest="binary_file",
+            help=(
+                "Save the timing and status of each test in said file, in a "
+                "compact binary format read by nosetimer.export."
+            ),
+        )
+
+        parser.add_option(
+            "--timer-bounded-memory",
+            action="store_true",
+            default=False,
+            dest="timer_bounded_memory",
+            help=(
+                "Only keep the --timer-top-n slowest tests in memory instead "
+                "of every test. The report and the exports then only know "
+                "about those tests."
+            ),
+        )
+
+        parser.add_option(
+            "--timer-histogram",
+            action="store_true",
+            default=False,
+            dest="timer_histogram",
+            help=(
+                "Report the p50, p90, p99 and max test durations, overall, "
+                "per status and per top-level package, and a histogram."
+            ),
+        )
+
+        parser.add_option(
+            "--timer-tree",
+            action="store_true",
+            default=False,
+            dest="timer_tree",
+            help=(
+                "Report the time spent per package, module and class, as a "
+                "tree, heaviest first."
+            ),
+        )
+
+        parser.add_option(
+            "--timer-imports",
+            action="store_true",
+            default=False,
+            dest="timer_imports",
+            help=(
+                "Report the time spent importing each test module and "
+                "collecting its tests, and the slowest modules it imports."
+            ),
+        )
+
+        parser.add_option(
+            "--timer-trace-file",
+            action="store",
+            default=None,
+            dest="timer_trace_file",
+            help=(
+                "Save the timeline of the tests and fixtures run by each "
+                "process in said file, in the Chrome trace format."
+            ),
+        )
+
+        parser.add_option(
+            "--timer-cpu",
+            action="store_true",
+            default=False,
+            dest="timer_cpu",
+            help=(
+                "Also measure the CPU time (user and system) of each test, "
+                "and the time it spent waiting (e.g. on I/O or sleeping)."
+            ),
+        )
+
+        parser.add_option(
+            "--timer-memory",
+            action="store_true",
+            default=False,
+            dest="timer_memory",
+            help=(
+                "Also measure how much the peak memory (RSS) of the process "
+                "grew during each test, and how much of it was retained."
+            ),
+        )
+
+        parser.add_option(
+            "--timer-memory-fail",
+            action="store",
+            default=None,
+            dest="timer_memory_fail",
+            help=(
+                "Fail tests whose peak memory grew by more than said size. "
+                "Default size unit is a megabyte, but you can set it "
+                "explicitly (e.g. 500MB, 2GB). Implies --timer-memory."
+            ),
+        )
+
+        parser.add_option(
+            "--timer-tracemalloc",
+            action="store",
+            default="0",
+            dest="timer_tracemalloc",
+            help=(
+                "Trace Python allocations with tracemalloc and report the N "
+                "top allocation sites of each test. Tracing slows tests down "
+                "noticeably. Implies --timer-memory."
+            ),
+        )
+
+        parser.add_option(
+            "--timer-profile-dir",
+            action="store",
+            default=None,
+            dest="timer_profile_dir",
+            help=(
+                "Sample the stack of each test in the background and, for the "
+                "tests slower than --timer-warning, save the samples in said "
+                "directory as flamegraph-compatible collapsed stacks."
+            ),
+        )
+
+        parser.add_option(
+            "--timer-timeout",
+            action="store",
+            default=None,
+            dest="timer_timeout",
+            help=(
+                "Interrupt the tests running for longer than said time, with "
+                "a 'timeout' status, after dumping the stacks of every thread "
+                "to stderr. Default time unit is a second."
+            ),
+        )
+
+        parser.add_option(
+            "--timer-budget-file",
+            action="store",
+            default=None,
+            dest="timer_budget_file",
+            help=(
+                "Fail the tests going over their budget, as given by the "
+                "first matching line of said file, made of lines like "
+                "'tests.db.* 2s'. Budgets declared in the tests win."
+            ),
+        )
+
+        parser.add_option(
+            "--timer-repeat",
+            action="store",
+            default=0,
+            dest="timer_repeat",
+            metavar="K",
+            help=(
+                "With --timer-fail, rerun the tests over the threshold K more "
+                "times and only fail them if the median of all their runs is "
+                "still over it."
+            ),
+        )
+
         _time_units_help = ("Default time unit is a second, but you can set "
                             "it explicitly (e.g. 1s, 500ms)")
 
@@ -0,0 +1,75 @@
+"""Low-overhead sampling profiler for the tests being timed."""
+
+import os
+import re
+import sys
+import threading
+
+
+def _collapse(frame):
+    """Get the collapsed (flamegraph) representation of a stack, root first."""
+    names = []
+    while frame is not None:
+        code = frame.f_code
+        names.append('{0} ({1}:{2})'.format(code.co_name, code.co_filename, code.co_firstlineno))
+        frame = frame.f_back
+    return ';'.join(reversed(names))
+
+
+def write_folded(directory, test_id, counts):
+    """Write collapsed stacks to ``<directory>/<test_id>.folded``.
+
+    The file can be fed as is to ``flamegraph.pl`` or speedscope.
+    """
+    filename = re.sub(r'[^\w.\-]+', '_', str(test_id))[:200] + '.folded'
+    path = os.path.join(directory, filename)
+    with open(path, 'w') as f:
+        for stack, count in sorted(counts.items()):
+            f.write('{0} {1}\n'.format(stack, count))
+    return path
+
+
+class StackSampler(object):
+    """Sample the stack of a thread every ``interval`` seconds.
+
+    Sampling happens in a background thread, so the sampled code runs
+    untouched and only pays for the sampler holding the GIL briefly.
+    """
+
+    def __init__(self, interval=0.005):
+        self.interval = interval
+        self._lock = threading.Lock()
+        self._stopped = threading.Event()
+        self._sampler = None
+        self._thread_id = None
+        self._counts = {}
+
+    def start(self):
+        """Start sampling the current thread, forgetting previous samples."""
+        if self._sampler is None:
+            self._sampler = threading.Thread(target=self._run, name='nose-timer-sampler')
+            self._sampler.daemon = True
+            self._sampler.start()
+        with self._lock:
+            self._counts = {}
+            self._thread_id = threading.current_thread().ident
+
+    def stop(self):
+        """Stop sampling, get the ``{collapsed stack: count}`` samples."""
+        with self._lock:
+            counts, self._counts = self._counts, {}
+            self._thread_id = None
+        return counts
+
+    def close(self):
+        self._stopped.set()
+
+    def _run(self):
+        while not self._stopped.wait(self.interval):
+            with self._lock:
+                if self._thread_id is None:
+                    continue
+                frame = sys._current_frames().get(self._thread_id)
+                if frame is not None:
+                    stack = _collapse(frame)
+                    self._counts[stack] = self._counts.get(stack, 0) + 1
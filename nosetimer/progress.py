@@ -0,0 +1,128 @@
+"""Live progress of a run, with an ETA out of the previous durations."""
+
+import threading
+import timeit
+
+from nosetimer import stats
+
+
+class Progress(object):
+    """Render a status line about the run every ``interval`` seconds.
+
+    ``durations`` are the previous durations of the tests, and ``expected``
+    the predicted duration of the whole run. ``follow`` is called before
+    each render to get the records completed by other processes.
+
+    When nose writes nothing per test on ``stream`` (``verbosity`` 0), the
+    line is rendered by a background thread, so it costs nothing per test
+    and keeps ticking while a test hangs. It is redrawn in place on a
+    terminal, and printed less often elsewhere so logs stay readable.
+    Otherwise nose shares the stream, so the line is only printed between
+    two tests by :meth:`tick`, on a line of its own, every ``log_interval``
+    seconds, unless ``live`` tells to print it from the background thread
+    anyway, e.g. when no test runs in this process.
+    """
+
+    interval = 1.0
+    log_interval = 30.0
+    # tests this many times slower than usual are flagged
+    slow_ratio = 2.0
+
+    def __init__(self, stream, durations, expected, follow=None, verbosity=0, live=None):
+        self.stream = stream
+        self.durations = durations
+        self.expected = expected
+        self._follow = follow
+        self._live = verbosity < 1 if live is None else live
+        # the dots leave the cursor in the middle of a line
+        self._dots = verbosity == 1
+        # only redrawn in place when nose does not write in between
+        self._tty = verbosity < 1 and getattr(stream, 'isatty', lambda: False)()
+        self._lock = threading.Lock()
+        self._stopped = threading.Event()
+        self._thread = None
+        self._start = self._last = timeit.default_timer()
+        self._done = 0
+        self._done_predicted = 0.0
+        self._slow = 0
+        self._current = None
+
+    def start(self):
+        """Start rendering in the background, unless the line is printed between tests."""
+        if not self._live:
+            return
+        self._thread = threading.Thread(target=self._run, name='nose-timer-progress')
+        self._thread.daemon = True
+        self._thread.start()
+
+    def start_test(self, test_id):
+        with self._lock:
+            self._current = (test_id, timeit.default_timer())
+
+    def add(self, test_id, time_taken):
+        """Count a completed test."""
+        usual = self.durations.get(test_id)
+        with self._lock:
+            self._done += 1
+            self._done_predicted += usual if usual is not None else time_taken
+            if usual and time_taken > usual * self.slow_ratio:
+                self._slow += 1
+            self._current = None
+
+    def line(self, now):
+        """Get the status line of the run."""
+        elapsed = now - self._start
+        with self._lock:
+            parts = ['{0} tests'.format(self._done), '{0} elapsed'.format(stats.format_duration(elapsed))]
+            if self.expected:
+                parts.insert(0, '{0:3.0f}%'.format(min(self._done_predicted / self.expected, 1.0) * 100))
+                if self._done_predicted:
+                    # the pace so far accounts for the overhead and the workers
+                    left = max(self.expected - self._done_predicted, 0.0) * elapsed / self._done_predicted
+                    parts.append('~{0} left'.format(stats.format_duration(left)))
+            if self._slow:
+                parts.append('{0} slower than usual'.format(self._slow))
+            if self._current is not None:
+                test_id, started = self._current
+                running = 'running {0} for {1}'.format(test_id, stats.format_duration(now - started))
+                usual = self.durations.get(test_id)
+                if usual and now - started > usual * self.slow_ratio:
+                    running += ' (usually {0})'.format(stats.format_duration(usual))
+                parts.append(running)
+        return ' | '.join(parts)
+
+    def tick(self):
+        """Print the line between two tests, at most every ``log_interval`` seconds."""
+        if self._live or timeit.default_timer() - self._last < self.log_interval:
+            return
+        self.render()
+
+    def render(self):
+        if self._follow is not None:
+            for record in self._follow():
+                if 'id' in record:
+                    self.add(record['id'], record['time'])
+        self._last = now = timeit.default_timer()
+        line = self.line(now)
+        if self._tty:
+            self.stream.write('\r' + line + '\x1b[K')
+        elif self._dots:
+            self.stream.write('\n' + line + '\n')
+        else:
+            self.stream.write(line + '\n')
+        self.stream.flush()
+
+    def _run(self):
+        interval = self.interval if self._tty else self.log_interval
+        while not self._stopped.wait(interval):
+            self.render()
+
+    def close(self):
+        """Stop rendering and clear the status line."""
+        self._stopped.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+            if self._tty:
+                self.stream.write('\r\x1b[K')
+                self.stream.flush()
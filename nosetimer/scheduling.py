@@ -0,0 +1,233 @@
+"""Reorder collected tests using previously recorded durations."""
+
+import bisect
+import heapq
+import inspect
+import unittest
+
+from nose.suite import ContextSuite
+from nose.suite import LazySuite
+
+from nosetimer import stats
+
+
+def can_split(context, fixt):
+    """Fixture check of the multiprocess plugin.
+
+    Mirrors ``MultiProcessTestRunner.checkCanSplit``: contexts can tell that
+    their fixtures are reentrant by setting ``_multiprocess_can_split_``.
+    """
+    if not fixt:
+        return False
+    if getattr(context, '_multiprocess_can_split_', False):
+        return False
+    return True
+
+
+def has_fixtures(context, fixt):
+    """Fixture check keeping every suite with fixtures whole."""
+    return bool(fixt)
+
+
+def iter_batches(test, check=can_split):
+    """Split a suite into the units the multiprocess plugin dispatches.
+
+    Suites with context fixtures (as told by ``check``) are kept whole, any
+    other suite is walked down to the test case level, exactly like
+    ``MultiProcessTestRunner.nextBatch`` does.
+    """
+    if ((isinstance(test, ContextSuite) and test.hasFixtures(check))
+            or not getattr(test, 'can_split', True)
+            or not isinstance(test, unittest.TestSuite)):
+        # special case: when run like nosetests path/to/module.py the
+        # top-level suite only holds one item sharing its context.
+        if isinstance(test, ContextSuite):
+            contained = list(test)
+            if len(contained) == 1 and getattr(contained[0], 'context', None) == test.context:
+                test = contained[0]
+            else:
+                # iterating may have consumed a generator, keep the tests
+                test._tests = contained
+        yield test
+    else:
+        for case in test:
+            for batch in iter_batches(case, check):
+                yield batch
+
+
+def context_id(context):
+    """Get the test id prefix of a module, class or generator context."""
+    if context is None:
+        return ''
+    if inspect.ismodule(context):
+        return context.__name__
+    return '{0}.{1}'.format(context.__module__, getattr(context, '__qualname__', context.__name__))
+
+
+def batch_id(batch):
+    """Get the test id prefix covering every test of a batch."""
+    if not isinstance(batch, unittest.TestSuite):
+        return batch.id()
+    return context_id(getattr(batch, 'context', None))
+
+
+class DurationIndex(object):
+    """Predict the duration of tests and suites out of recorded durations.
+
+    Test ids are kept sorted along with their cumulative durations, so the
+    duration of a whole module or class is two bisections away.
+    """
+
+    def __init__(self, durations, default=None):
+        items = sorted(durations.items())
+        self._ids = [k for k, _ in items]
+        self._cumulative = [0.0]
+        for _, time_taken in items:
+            self._cumulative.append(self._cumulative[-1] + time_taken)
+        if default is None:
+            default = stats.median(sorted(durations.values())) or 0.0
+        self.default = default
+
+    def __len__(self):
+        return len(self._ids)
+
+    def _sum(self, lo, hi):
+        return self._cumulative[hi] - self._cumulative[lo], hi - lo
+
+    def predict(self, prefix):
+        """Predict the duration of ``prefix`` and of every test below it.
+
+        A prefix no recorded test falls under is estimated with ``default``,
+        so this is only the estimate of a batch when it is a single test or a
+        generator; see ``predict_batch`` for the others.
+        """
+        ids = self._ids
+        lo = bisect.bisect_left(ids, prefix)
+        hi = bisect.bisect_right(ids, prefix)
+        total, count = self._sum(lo, hi)
+        # children are separated by a dot, generated tests add their
+        # arguments in parentheses; '/' and ')' are the characters right after
+        for first, last in (('.', '/'), ('(', ')')):
+            lo = bisect.bisect_left(ids, prefix + first)
+            hi = bisect.bisect_left(ids, prefix + last)
+            children, children_count = self._sum(lo, hi)
+            total += children
+            count += children_count
+        if not count:
+            return self.default
+        return total
+
+
+def predict_batch(batch, index):
+    """Predict the duration of ``batch``, summed up test by test.
+
+    Each test never timed counts as ``index.default``. Generators are
+    predicted as a whole, as listing their tests would run the generator
+    function ahead of its fixtures.
+    """
+    if (not isinstance(batch, unittest.TestSuite)
+            or inspect.isroutine(getattr(batch, 'context', None))):
+        return index.predict(batch_id(batch))
+    tests = list(batch)
+    # iterating may have consumed a generator, keep the tests
+    batch._tests = tests
+    return sum(predict_batch(test, index) for test in tests)
+
+
+def predict(test, index, check=has_fixtures):
+    """Predict the duration of ``test``.
+
+    Returns a suite of the batches of ``test``, to be run in its stead as
+    iterating may have consumed it, and the predicted duration.
+    """
+    batches = list(iter_batches(test, check))
+    return LazySuite(batches), sum(predict_batch(batch, index) for batch in batches)
+
+
+def longest_first(test, index, check=can_split):
+    """Get a suite dispatching the batches of ``test`` longest first.
+
+    When workers pull their tasks from a shared queue, this is the
+    longest-processing-time-first schedule.
+    """
+    batches = list(iter_batches(test, check))
+    batches.sort(key=lambda batch: predict_batch(batch, index), reverse=True)
+    return LazySuite(batches)
+
+
+def _reorder(test, key):
+    """Sort every suite below ``test`` in place, get the key of ``test``.
+
+    The key of a suite is ``(failing, predicted)`` summed up over its tests.
+    """
+    if not isinstance(test, unittest.TestSuite):
+        return key(test.id())
+    tests = [(_reorder(case, key), case) for case in test]
+    # sort is stable, so ties keep their collection order
+    tests.sort(key=lambda item: item[0], reverse=True)
+    test._tests = [case for _, case in tests]
+    return (sum(k[0] for k, _ in tests), sum(k[1] for k, _ in tests))
+
+
+def reorder(test, index, failures, longest=True):
+    """Get ``test`` running previous failures first, then longest (or shortest) first.
+
+    Suites are reordered within, never split, so fixtures still run once.
+    """
+    sign = 1 if longest else -1
+    _reorder(test, lambda test_id: (int(test_id in failures), sign * index.predict(test_id)))
+    return test
+
+
+def shard(test, index, k, n, check=has_fixtures):
+    """Get a suite of the batches of ``test`` in shard ``k`` out of ``n``.
+
+    Batches are assigned longest first to the least loaded shard, so the
+    shards have near-equal predicted durations. The assignment only depends
+    on the collected tests and on ``index``, so every CI node computes the
+    same shards. Batches keep their collection order within a shard.
+    """
+    batches = list(iter_batches(test, check))
+    predicted = [(predict_batch(batch, index), i) for i, batch in enumerate(batches)]
+    # the position breaks ties, so the assignment is deterministic
+    predicted.sort(key=lambda item: (-item[0], item[1]))
+    loads = [(0.0, shard_index) for shard_index in range(n)]
+    selected = []
+    for time_taken, i in predicted:
+        load, shard_index = heapq.heappop(loads)
+        if shard_index == k - 1:
+            selected.append(i)
+        heapq.heappush(loads, (load + time_taken, shard_index))
+    return LazySuite([batches[i] for i in sorted(selected)])
+
+
+def _density(item):
+    time_taken, value = item[0], item[1]
+    return value / time_taken if time_taken > 0 else float('inf')
+
+
+def select(test, durations, failure_rates, budget, check=has_fixtures):
+    """Get the most valuable batches of ``test`` fitting in ``budget`` seconds.
+
+    The value of a test is how often it failed; a test never timed is worth
+    as much as one always failing. Batches are picked greedily by value per
+    predicted second, shortest first among equals, which is the classic
+    knapsack heuristic, and keep their collection order. Returns a suite of
+    the selected batches and the ``(batch_id, predicted)`` of the others.
+    """
+    index = DurationIndex(durations)
+    values = DurationIndex(dict((k, failure_rates.get(k, 0.0)) for k in durations), default=1.0)
+    batches = list(iter_batches(test, check))
+    candidates = []
+    for i, batch in enumerate(batches):
+        candidates.append((predict_batch(batch, index), predict_batch(batch, values), i))
+    # the position breaks ties, so the selection is deterministic
+    candidates.sort(key=lambda item: (-_density(item), item[0], item[2]))
+    selected, skipped = [], []
+    for time_taken, _, i in candidates:
+        if time_taken <= budget:
+            budget -= time_taken
+            selected.append(i)
+        else:
+            skipped.append((batch_id(batches[i]), time_taken))
+    return LazySuite([batches[i] for i in sorted(selected)]), skipped
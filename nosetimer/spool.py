@@ -0,0 +1,67 @@
+"""Lock-free channel carrying test results from the multiprocess workers."""
+
+import json
+import os
+import shutil
+import tempfile
+
+
+class ResultSpool(object):
+    """A directory of append-only JSON Lines files, one per process.
+
+    Every process appends its own records to ``<pid>.jsonl`` with a single
+    ``write()`` per record, so no lock is shared between the workers and a
+    record is on disk before the worker hands its batch back to the main
+    process. The main process merges all files once the tests are over.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._fd = None
+        self._pid = None
+        self._offsets = {}
+
+    @classmethod
+    def create(cls):
+        """Create a spool in a new temporary directory."""
+        return cls(tempfile.mkdtemp(prefix='nose-timer-'))
+
+    def put(self, record):
+        """Append a record to the file of the current process."""
+        pid = os.getpid()
+        if self._pid != pid:
+            # first record of this process (or of a forked child)
+            filename = os.path.join(self.path, '{0}.jsonl'.format(pid))
+            self._fd = os.open(filename, os.O_WRONLY | os.O_CREAT | os.O_APPEND)
+            self._pid = pid
+        line = json.dumps(record, separators=(',', ':')) + '\n'
+        os.write(self._fd, line.encode('utf-8'))
+
+    def __iter__(self):
+        """Iterate over the records of every process."""
+        for name in sorted(os.listdir(self.path)):
+            with open(os.path.join(self.path, name), 'rb') as f:
+                for line in f:
+                    # skip the torn last line of a worker killed mid-write
+                    if line.endswith(b'\n'):
+                        yield json.loads(line.decode('utf-8'))
+
+    def follow(self):
+        """Iterate over the records written since the previous call, while the workers run."""
+        for name in sorted(os.listdir(self.path)):
+            offset = self._offsets.get(name, 0)
+            with open(os.path.join(self.path, name), 'rb') as f:
+                f.seek(offset)
+                data = f.read()
+            # leave a line being written for the next call
+            end = data.rfind(b'\n') + 1
+            self._offsets[name] = offset + end
+            for line in data[:end].splitlines():
+                yield json.loads(line.decode('utf-8'))
+
+    def close(self):
+        """Close the file of the current process and remove the spool."""
+        if self._fd is not None and self._pid == os.getpid():
+            os.close(self._fd)
+        self._fd = self._pid = None
+        shutil.rmtree(self.path, ignore_errors=True)
@@ -0,0 +1,221 @@
+"""Small statistics helpers shared by the timer plugin."""
+
+import heapq
+import itertools
+import math
+
+
+def percentile(values, pct):
+    """Get the ``pct`` percentile of ``values`` using linear interpolation.
+
+    ``values`` must be sorted. Returns ``None`` for an empty sequence.
+    """
+    if not values:
+        return None
+    k = (len(values) - 1) * pct / 100.0
+    lo = int(math.floor(k))
+    hi = int(math.ceil(k))
+    if lo == hi:
+        return values[lo]
+    return values[lo] + (values[hi] - values[lo]) * (k - lo)
+
+
+def median(values):
+    """Get the median of sorted ``values``."""
+    return percentile(values, 50)
+
+
+def format_duration(seconds):
+    """Format a duration with three significant digits and a fitting unit."""
+    for unit, scale in (('s', 1.0), ('ms', 1e-3), ('us', 1e-6)):
+        if seconds >= scale:
+            return '{0:.3g}{1}'.format(seconds / scale, unit)
+    return '{0:.3g}ns'.format(seconds / 1e-9)
+
+
+def format_size(size):
+    """Format a number of bytes with three significant digits and a fitting unit."""
+    for unit, scale in (('GB', 1 << 30), ('MB', 1 << 20), ('KB', 1 << 10)):
+        if abs(size) >= scale:
+            return '{0:.3g}{1}'.format(size / float(scale), unit)
+    return '{0}B'.format(size)
+
+
+def stdev(values):
+    """Get the sample standard deviation of ``values``, 0 for a single value."""
+    if len(values) < 2:
+        return 0.0
+    mean = float(sum(values)) / len(values)
+    return math.sqrt(sum((v - mean) ** 2 for v in values) / (len(values) - 1))
+
+
+def mad(values, center=None):
+    """Get the median absolute deviation of sorted ``values``."""
+    if not values:
+        return None
+    if center is None:
+        center = median(values)
+    return median(sorted(abs(v - center) for v in values))
+
+
+class TopN(object):
+    """Keep the ``n`` items with the largest values seen so far.
+
+    Uses a min-heap, so memory is O(n) and each push is O(log n), while the
+    count and the sum of every pushed value are kept as they stream in.
+    """
+
+    def __init__(self, n):
+        self.n = n
+        self.count = 0
+        self.total = 0.0
+        self._heap = []
+        # tie breaker, so items themselves are never compared
+        self._seq = itertools.count()
+
+    def __len__(self):
+        return len(self._heap)
+
+    def push(self, key, value, item):
+        self.count += 1
+        self.total += value
+        entry = (value, next(self._seq), key, item)
+        if len(self._heap) < self.n:
+            heapq.heappush(self._heap, entry)
+        elif value > self._heap[0][0]:
+            heapq.heapreplace(self._heap, entry)
+
+    def items(self):
+        """Get the ``(key, item)`` pairs, largest value first."""
+        return [(key, item) for _, _, key, item in sorted(self._heap, reverse=True)]
+
+
+class LogHistogram(object):
+    """Log-bucketed histogram of durations, in the spirit of HdrHistogram.
+
+    Bucket bounds grow geometrically, so the relative precision of the
+    quantiles (about 3%) is the same from microseconds to hours, and memory
+    only depends on the range of the durations, not on their number.
+    """
+
+    buckets_per_decade = 40
+    lowest = 1e-6
+
+    def __init__(self):
+        self.counts = {}
+        self.count = 0
+        self.total = 0.0
+        self.min = None
+        self.max = None
+
+    def _index(self, value):
+        if value <= self.lowest:
+            return 0
+        return int(math.log10(value / self.lowest) * self.buckets_per_decade)
+
+    def _bound(self, index):
+        """Get the lower bound of bucket ``index``."""
+        return self.lowest * 10 ** (float(index) / self.buckets_per_decade)
+
+    def add(self, value):
+        index = self._index(value)
+        self.counts[index] = self.counts.get(index, 0) + 1
+        self.count += 1
+        self.total += value
+        if self.min is None or value < self.min:
+            self.min = value
+        if self.max is None or value > self.max:
+            self.max = value
+
+    def quantile(self, pct):
+        """Get the ``pct`` percentile, within the precision of a bucket."""
+        if not self.count:
+            return None
+        rank = max(1, int(math.ceil(pct / 100.0 * self.count)))
+        seen = 0
+        for index in sorted(self.counts):
+            seen += self.counts[index]
+            if seen >= rank:
+                # geometric middle of the bucket, clamped to the exact extremes
+                value = math.sqrt(self._bound(index) * self._bound(index + 1))
+                return min(max(value, self.min), self.max)
+
+    def rows(self, per_decade=4):
+        """Get ``(lower_bound, count)`` rows merging buckets for display.
+
+        Empty rows between the smallest and the largest duration are kept.
+        """
+        if not self.count:
+            return []
+        width = self.buckets_per_decade // per_decade
+        merged = {}
+        for index, count in self.counts.items():
+            merged[index // width] = merged.get(index // width, 0) + count
+        return [(self._bound(row * width), merged.get(row, 0))
+                for row in range(min(merged), max(merged) + 1)]
+
+
+class TimingTree(object):
+    """Aggregate test times into a package, module, class and test tree.
+
+    Each test id is split once as it is added and its time is added to every
+    node on its path, so reporting is a mere walk of the tree.
+    """
+
+    __slots__ = ('total', 'self_time', 'count', 'children')
+
+    def __init__(self):
+        self.total = 0.0
+        self.self_time = 0.0
+        self.count = 0
+        self.children = {}
+
+    @staticmethod
+    def split(test_id):
+        """Split a test id into names, keeping the arguments of generated tests whole."""
+        head, sep, args = str(test_id).partition('(')
+        names = head.split('.')
+        names[-1] += sep + args
+        return names
+
+    def _path(self, names):
+        node = self
+        yield node
+        for name in names:
+            child = node.children.get(name)
+            if child is None:
+                child = node.children[name] = TimingTree()
+            node = child
+            yield node
+
+    def add(self, test_id, time_taken):
+        """Add the time of a test."""
+        for node in self._path(self.split(test_id)):
+            node.total += time_taken
+            node.count += 1
+        node.self_time += time_taken
+
+    def add_self(self, name, time_taken):
+        """Add time spent in a node itself, like its fixtures."""
+        for node in self._path(name.split('.')):
+            node.total += time_taken
+        node.self_time += time_taken
+
+    def walk(self, limit=None, depth=0):
+        """Get ``(depth, name, node)`` for the inner nodes, heaviest first.
+
+        At most ``limit`` children of each node are walked.
+        """
+        children = sorted(self.children.items(), key=lambda item: item[1].total, reverse=True)
+        for name, node in children[:limit]:
+            if node.children:
+                yield depth, name, node
+                for row in node.walk(limit, depth + 1):
+                    yield row
+
+    def to_dict(self):
+        """Get the tree as nested dicts, for the JSON export."""
+        data = {'time': self.total, 'self': self.self_time, 'count': self.count}
+        if self.children:
+            data['children'] = dict((name, node.to_dict()) for name, node in self.children.items())
+        return data
@@ -0,0 +1,84 @@
+"""Timeline of the tests run by each process, and its Chrome trace export."""
+
+import json
+
+
+class Timeline(object):
+    """Start and end of the tests and fixtures run by each process.
+
+    Times are seconds since the epoch, so that the timestamps of the
+    multiprocess workers can be compared.
+    """
+
+    def __init__(self):
+        # (test_id, pid, start, end, status)
+        self.tests = []
+        # (context, phase, pid, start, end)
+        self.spans = []
+
+    def add_test(self, test_id, entry):
+        if 'start' in entry:
+            self.tests.append((test_id, entry['pid'], entry['start'], entry['end'], entry['status']))
+
+    def add_span(self, span):
+        """Add a ``{'span': context, 'phase': ..., 'pid': ..., 'start': ..., 'end': ...}`` fixture span."""
+        self.spans.append((span['span'], span['phase'], span['pid'], span['start'], span['end']))
+
+    def bounds(self):
+        """Get the start of the first test or fixture, and the end of the last one."""
+        events = [event[2:4] for event in self.tests] + [event[3:5] for event in self.spans]
+        if not events:
+            return None, None
+        return min(start for start, _ in events), max(end for _, end in events)
+
+    def workers(self):
+        """Get the ``(pid, tests, busy, finished)`` of each process, in the order they started.
+
+        ``busy`` is the time spent in tests and fixtures, and ``finished``
+        the end of the last one.
+        """
+        workers = {}
+        for _, pid, start, end, _ in self.tests:
+            worker = workers.setdefault(pid, [start, 0, 0.0, end])
+            worker[1] += 1
+            self._extend(worker, start, end)
+        for _, _, pid, start, end in self.spans:
+            self._extend(workers.setdefault(pid, [start, 0, 0.0, end]), start, end)
+        return [
+            (pid, tests, busy, finished)
+            for pid, (_, tests, busy, finished) in sorted(workers.items(), key=lambda item: item[1][0])
+        ]
+
+    @staticmethod
+    def _extend(worker, start, end):
+        worker[0] = min(worker[0], start)
+        worker[2] += end - start
+        worker[3] = max(worker[3], end)
+
+    def write_trace(self, path):
+        """Write the timeline in the Chrome Trace Event format, one lane per process.
+
+        The file can be opened in Perfetto (https://ui.perfetto.dev) or
+        ``chrome://tracing``.
+        """
+        origin, _ = self.bounds()
+
+        def micros(seconds):
+            return round(seconds * 1e6, 3)
+
+        events = []
+        for i, (pid, _, _, _) in enumerate(self.workers()):
+            events.append({'name': 'process_name', 'ph': 'M', 'pid': pid, 'args': {'name': 'pid {0}'.format(pid)}})
+            events.append({'name': 'process_sort_index', 'ph': 'M', 'pid': pid, 'args': {'sort_index': i}})
+        for test_id, pid, start, end, status in self.tests:
+            events.append({
+                'name': test_id, 'cat': 'test', 'ph': 'X', 'pid': pid, 'tid': pid,
+                'ts': micros(start - origin), 'dur': micros(end - start), 'args': {'status': status},
+            })
+        for context, phase, pid, start, end in self.spans:
+            events.append({
+                'name': '{0} {1}'.format(context, phase), 'cat': 'fixture', 'ph': 'X', 'pid': pid, 'tid': pid,
+                'ts': micros(start - origin), 'dur': micros(end - start),
+            })
+        with open(path, 'w') as f:
+            json.dump({'traceEvents': events, 'displayTimeUnit': 'ms'}, f)
@@ -0,0 +1,73 @@
+"""Hard per-test timeout, dumping the stacks of a hung test."""
+
+import signal
+import sys
+import threading
+import traceback
+
+try:
+    import faulthandler
+except ImportError:  # pragma: no cover
+    faulthandler = None
+
+
+class TestTimeout(Exception):
+    """Raised in a test running for longer than its hard time limit."""
+
+
+def dump_stacks(stream):
+    """Write the stack of every thread to ``stream``."""
+    names = dict((t.ident, t.name) for t in threading.enumerate())
+    for ident, frame in sys._current_frames().items():
+        stream.write('Thread {0} ({1}):\n'.format(ident, names.get(ident, 'unknown')))
+        stream.write(''.join(traceback.format_stack(frame)))
+    stream.flush()
+
+
+class Watchdog(object):
+    """Dump the stacks of every thread and interrupt a test running too long.
+
+    The test is interrupted with a :class:`TestTimeout` raised from a
+    ``SIGALRM`` handler, which is only possible when tests run in the main
+    thread of a POSIX process. Should the handler not run, because the test
+    hangs in C code or cannot be interrupted, :mod:`faulthandler` still
+    dumps the stacks ``grace`` seconds later.
+    """
+
+    grace = 1.0
+
+    def __init__(self, timeout, stream=None):
+        self.timeout = timeout
+        self.stream = stream or sys.__stderr__
+        self._armed = False
+        self._previous = None
+
+    @staticmethod
+    def can_interrupt():
+        return hasattr(signal, 'setitimer') and isinstance(threading.current_thread(), threading._MainThread)
+
+    def start(self):
+        if self.can_interrupt():
+            self._previous = signal.signal(signal.SIGALRM, self._interrupt)
+            signal.setitimer(signal.ITIMER_REAL, self.timeout)
+            self._armed = True
+        if faulthandler is not None:
+            faulthandler.dump_traceback_later(self.timeout + self.grace, exit=False, file=self.stream)
+
+    def cancel(self):
+        if faulthandler is not None:
+            faulthandler.cancel_dump_traceback_later()
+        if self._armed:
+            signal.setitimer(signal.ITIMER_REAL, 0)
+            # None when the previous handler was not set from Python
+            signal.signal(signal.SIGALRM, self._previous if self._previous is not None else signal.SIG_DFL)
+            self._armed = False
+
+    def _interrupt(self, signum, frame):
+        self.cancel()
+        self.stream.write('Test timed out after {0:0.4f}s\n'.format(self.timeout))
+        if faulthandler is not None:
+            faulthandler.dump_traceback(file=self.stream, all_threads=True)
+        else:  # pragma: no cover
+            dump_stacks(self.stream)
+        raise TestTimeout('Test timed out after {0:0.4f}s'.format(self.timeout))
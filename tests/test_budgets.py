@@ -0,0 +1,92 @@
+import os
+import shutil
+import sys
+import tempfile
+import types
+import unittest
+
+import mock
+from nose.case import FunctionTestCase
+from nose.case import MethodTestCase
+from nose.pyversion import unbound_method
+from parameterized import parameterized
+
+from nosetimer import budgets
+
+
+class _Case(unittest.TestCase):
+
+    @budgets.budget('5ms')
+    def test_method(self):
+        pass
+
+    def test_plain(self):
+        pass
+
+
+@budgets.budget('1s')
+class _BudgetedCase(_Case):
+
+    def test_other(self):
+        pass
+
+
+class _Plain(object):
+
+    @budgets.budget('3s')
+    def test_method(self):
+        pass
+
+
+@budgets.budget('2s')
+def _function():
+    pass
+
+
+class TestBudgets(unittest.TestCase):
+
+    def setUp(self):
+        super(TestBudgets, self).setUp()
+        self.tmpdir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.tmpdir)
+
+    @parameterized.expand([
+        ('method', _Case('test_method'), '5ms'),
+        ('none', _Case('test_plain'), None),
+        ('method_over_class', _BudgetedCase('test_method'), '5ms'),
+        ('class', _BudgetedCase('test_other'), '1s'),
+        ('function', FunctionTestCase(_function), '2s'),
+        ('nose_method', MethodTestCase(unbound_method(_Plain, vars(_Plain)['test_method'])), '3s'),
+        ('mock', mock.MagicMock(), None),
+    ])
+    def test_declared(self, _, case, expected):
+        self.assertEqual(budgets.declared(case), expected)
+
+    def test_declared_module(self):
+        module = types.ModuleType('_budgeted_module')
+        module._timer_budget = '10ms'
+        cls = type('Case', (unittest.TestCase,), {'runTest': lambda self: None, '__module__': module.__name__})
+        with mock.patch.dict(sys.modules, {module.__name__: module}):
+            self.assertEqual(budgets.declared(cls()), '10ms')
+
+    def test_read_rules(self):
+        path = os.path.join(self.tmpdir, 'budgets')
+        with open(path, 'w') as f:
+            f.write('# glob budget\n\ntests.db.*  2s\ntests.*  5ms  # fast\n')
+
+        self.assertEqual(budgets.read_rules(path), [('tests.db.*', '2s'), ('tests.*', '5ms')])
+
+    def test_read_rules_error(self):
+        path = os.path.join(self.tmpdir, 'budgets')
+        with open(path, 'w') as f:
+            f.write('tests.db.*\n')
+
+        self.assertRaises(ValueError, budgets.read_rules, path)
+
+    def test_get(self):
+        parse = mock.Mock(side_effect=lambda limit: {'5ms': 5.0, '2s': 2000.0, '1s': 1000.0}[limit])
+        index = budgets.Budgets(parse, [('tests.db.*', '2s'), ('tests.*', '1s')])
+
+        self.assertEqual(index.get('tests.db.test_query', _Case('test_plain')), 2000.0)
+        self.assertEqual(index.get('tests.test_x', _Case('test_method')), 5.0)
+        self.assertEqual(index.get('other.test_y', _Case('test_plain')), None)
@@ -0,0 +1,33 @@
+import time
+import unittest
+
+from nosetimer import clock
+
+
+class TestClock(unittest.TestCase):
+
+    def test_now_ns(self):
+        start = clock.now_ns()
+        end = clock.now_ns()
+
+        self.assertIsInstance(start, int)
+        self.assertGreaterEqual(end, start)
+        self.assertGreaterEqual(clock.resolution_ns(), 1)
+        self.assertEqual(clock.seconds(1500000000), 1.5)
+
+    def test_timestamp(self):
+        self.assertAlmostEqual(clock.timestamp(clock.now_ns()), time.time(), delta=0.1)
+
+    def test_calibration(self):
+        calibration = clock.Calibration([300, 100, 200], 1)
+
+        self.assertEqual(calibration.overhead_ns, 100)
+        self.assertEqual(calibration.uncertainty_ns, 190)
+
+    def test_measure(self):
+        calibration = clock.Calibration.measure(runs=100)
+
+        self.assertGreater(calibration.overhead_ns, 0)
+        self.assertGreaterEqual(calibration.uncertainty_ns, 0)
+        # an empty test takes microseconds, not milliseconds
+        self.assertLess(calibration.overhead_ns, 10 ** 6)
@@ -0,0 +1,111 @@
+import json
+import os
+import shutil
+import tempfile
+import unittest
+
+import mock
+from parameterized import parameterized
+
+from nosetimer import __main__ as cli
+from nosetimer import diff
+
+
+def _record(time_taken, **kwargs):
+    return dict(time=time_taken, status='success', **kwargs)
+
+
+class TestDiff(unittest.TestCase):
+
+    def setUp(self):
+        super(TestDiff, self).setUp()
+        self.old = {'pkg.test_slow': _record(1.0), 'pkg.test_gone': _record(0.5)}
+        self.new = [('pkg.test_slow', _record(3.0)), ('pkg.test_added', _record(0.25))]
+        # tests whose time only moves within the noise
+        for i, ratio in enumerate((1.0, 1.01, 0.99, 1.02, 0.98, 1.03, 0.97)):
+            self.old['pkg.Case.test_{0}'.format(i)] = _record(1.0)
+            self.new.append(('pkg.Case.test_{0}'.format(i), _record(ratio)))
+        self.new.append(('pkg.Case.test_fast', _record(0.1)))
+        self.old['pkg.Case.test_fast'] = _record(0.4)
+
+    @parameterized.expand([
+        ('pkg.mod.Case.test_1', 'pkg.mod'),
+        ('pkg.mod.test_1', 'pkg.mod'),
+        ('pkg.mod.test_gen(1.5, 2)', 'pkg.mod'),
+        # capitalized packages are not taken for the class
+        ('MyApp.tests.test_api.test_get', 'MyApp.tests.test_api'),
+        ('MyApp.tests.test_api.Case.test_get', 'MyApp.tests.test_api'),
+        ('MyApp.test_get', 'MyApp'),
+        ('test_1', 'test_1'),
+    ])
+    def test_module_of(self, test_id, module):
+        self.assertEqual(diff.module_of(test_id), module)
+
+    @parameterized.expand([
+        ('20%', (None, 0.2)),
+        ('100ms', (0.1, None)),
+        ('1.5s', (1.5, None)),
+        ('2', (2.0, None)),
+    ])
+    def test_parse_threshold(self, value, threshold):
+        self.assertEqual(diff.parse_threshold(value), threshold)
+
+    def test_parse_threshold_invalid(self):
+        with self.assertRaises(ValueError):
+            diff.parse_threshold('fast')
+
+    def test_diff(self):
+        result = diff.Diff(self.old, iter(self.new))
+
+        self.assertEqual(self.old, {})
+        self.assertEqual(result.added, [('pkg.test_added', 0.25)])
+        self.assertEqual(result.removed, [('pkg.test_gone', 0.5)])
+        significant = [(test_id, before, after) for test_id, before, after, significant in result.tests if significant]
+        self.assertEqual(significant, [('pkg.test_slow', 1.0, 3.0), ('pkg.Case.test_fast', 0.4, 0.1)])
+        module, before, after = result.modules[0]
+        self.assertEqual(module, 'pkg')
+        self.assertAlmostEqual(before, 8.9)
+        self.assertAlmostEqual(after, 10.35)
+        self.assertEqual(result.regressions(), [('pkg.test_slow', 1.0, 3.0, True)])
+        self.assertEqual(result.regressions(seconds=2.5), [])
+        self.assertEqual(result.regressions(ratio=1.5), [('pkg.test_slow', 1.0, 3.0, True)])
+
+    def test_significance_from_repeats(self):
+        result = diff.Diff(
+            {'test_1': _record(1.0, stdev=0.5), 'test_2': _record(1.0, stdev=0.01)},
+            [('test_1', _record(2.0, stdev=0.5)), ('test_2', _record(1.1, stdev=0.01))],
+        )
+        self.assertEqual([item[3] for item in result.tests], [False, True])
+
+    def test_report(self):
+        stream = mock.MagicMock(name='stream')
+        diff.Diff(self.old, iter(self.new)).report(stream, limit=1)
+
+        self.assertEqual(''.join(c[0][0] for c in stream.write.call_args_list).splitlines(), [
+            'Slower tests:',
+            'pkg.test_slow: +2.0000s +200.00% (1.0000s -> 3.0000s)',
+            'Faster tests:',
+            'pkg.Case.test_fast: -0.3000s -75.00% (0.4000s -> 0.1000s)',
+            'Modules:',
+            'pkg: +1.4500s +16.29% (8.9000s -> 10.3500s)',
+            'New tests: 1, 0.2500s',
+            'pkg.test_added: 0.2500s',
+            'Removed tests: 1, 0.5000s',
+            'pkg.test_gone: 0.5000s',
+            'Total: +1.4500s +16.29% (8.9000s -> 10.3500s), 1 tests significantly slower, 1 faster',
+        ])
+
+    def test_main(self):
+        tmpdir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, tmpdir)
+        old, new = os.path.join(tmpdir, 'old.json'), os.path.join(tmpdir, 'new.jsonl')
+        with open(old, 'w') as f:
+            json.dump({'tests': self.old}, f)
+        with open(new, 'w') as f:
+            for test_id, record in self.new:
+                f.write(json.dumps(dict(record, id=test_id)) + '\n')
+
+        with mock.patch('sys.stdout'):
+            self.assertEqual(cli.main(['diff', old, new]), 0)
+            self.assertEqual(cli.main(['diff', old, new, '--fail-over', '150%']), 1)
+            self.assertEqual(cli.main(['diff', old, new, '--fail-over', '2.5s']), 0)
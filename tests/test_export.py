@@ -0,0 +1,142 @@
+import json
+import os
+import shutil
+import tempfile
+import unittest
+
+from nosetimer import __main__ as cli
+from nosetimer import export
+
+
+class TestExport(unittest.TestCase):
+
+    def setUp(self):
+        super(TestExport, self).setUp()
+        self.tmpdir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.tmpdir)
+
+    def test_read_json(self):
+        path = os.path.join(self.tmpdir, 'timings.json')
+        with open(path, 'w') as f:
+            json.dump({'tests': {'test_1': {'time': 0.1, 'status': 'success'}}}, f)
+
+        timed_tests = export.read(path)
+
+        self.assertEqual(timed_tests, {'test_1': {'time': 0.1, 'status': 'success'}})
+        self.assertEqual(export.durations(timed_tests), {'test_1': 0.1})
+
+    def test_jsonl_round_trip(self):
+        path = os.path.join(self.tmpdir, 'timings.jsonl')
+        writer = export.JsonLinesWriter(path)
+        writer.write({'id': 'test_1', 'time': 0.1, 'status': 'success'})
+        writer.write({'id': 'test_2', 'time': 0.2, 'status': 'fail'})
+        writer.close()
+
+        self.assertEqual(export.read(path), {
+            'test_1': {'time': 0.1, 'status': 'success'},
+            'test_2': {'time': 0.2, 'status': 'fail'},
+        })
+        self.assertEqual(export.failures(export.read(path)), set(['test_2']))
+
+    def test_jsonl_flush_every(self):
+        path = os.path.join(self.tmpdir, 'timings.jsonl')
+        writer = export.JsonLinesWriter(path)
+        self.addCleanup(writer.close)
+        writer.flush_every = 2
+        writer.flush_interval = 3600
+
+        writer.write({'id': 'test_1', 'time': 0.1, 'status': 'success'})
+        self.assertEqual(export.read_jsonl(path), {})
+
+        writer.write({'id': 'test_2', 'time': 0.2, 'status': 'fail'})
+        self.assertEqual(sorted(export.read_jsonl(path)), ['test_1', 'test_2'])
+
+    def test_jsonl_torn_line(self):
+        path = os.path.join(self.tmpdir, 'timings.jsonl')
+        with open(path, 'w') as f:
+            f.write('{"id":"test_1","time":0.1,"status":"success"}\n{"id":"te')
+
+        self.assertEqual(export.read_jsonl(path), {'test_1': {'time': 0.1, 'status': 'success'}})
+
+    def test_binary_round_trip(self):
+        path = os.path.join(self.tmpdir, 'timings.ntb')
+        timed_tests = {
+            'pkg.mod.Test.test_1': {'time': 0.1, 'status': 'success'},
+            u'pkg.mod.Test.test_\xe9': {'time': 0.25, 'status': 'timeout'},
+            'pkg.mod.test_gen(0.5, 1.5)': {'time': 1.5, 'status': None},
+            'test_4': {'time': 2.0, 'status': 'fail'},
+        }
+        export.write_binary(path, sorted(timed_tests.items()))
+
+        self.assertTrue(export.is_binary(path))
+        self.assertEqual(export.read(path), timed_tests)
+        with export.BinaryTimings(path) as timings:
+            self.assertEqual(len(timings), 4)
+            self.assertEqual(list(timings.times), [0.1, 0.25, 1.5, 2.0])
+            self.assertEqual(timings.ids(), sorted(timed_tests))
+            # the test ids of a class share their prefix
+            self.assertEqual(timings._prefixes, ['pkg.mod.Test.', 'pkg.mod.', ''])
+            self.assertEqual(timings.get('pkg.mod.test_gen(0.5, 1.5)'), {'time': 1.5, 'status': None})
+            self.assertIsNone(timings.get('test_5'))
+
+    def test_binary_empty(self):
+        path = os.path.join(self.tmpdir, 'timings.ntb')
+        export.write_binary(path, [])
+        self.assertEqual(export.read_binary(path), {})
+
+    def test_binary_unknown_status(self):
+        path = os.path.join(self.tmpdir, 'timings.ntb')
+        with self.assertRaises(ValueError):
+            export.write_binary(path, [('test_1', {'time': 0.1, 'status': 'flaky'})])
+
+    def test_binary_invalid(self):
+        path = os.path.join(self.tmpdir, 'timings.ntb')
+        export.write_binary(path, [('test_1', {'time': 0.1, 'status': 'success'})])
+        with open(path, 'rb') as f:
+            data = f.read()
+        with open(path, 'wb') as f:
+            f.write(data[:-2])
+        with self.assertRaises(ValueError):
+            export.BinaryTimings(path)
+
+        with open(path, 'w') as f:
+            f.write('{"tests": {}}')
+        with self.assertRaises(ValueError):
+            export.BinaryTimings(path)
+
+    def test_convert(self):
+        source = os.path.join(self.tmpdir, 'timings.json')
+        timed_tests = {
+            'test_1': {'time': 0.1, 'status': 'success'},
+            'test_2': {'time': 0.2, 'status': 'error'},
+        }
+        with open(source, 'w') as f:
+            json.dump({'tests': timed_tests}, f)
+
+        binary = os.path.join(self.tmpdir, 'timings.ntb')
+        self.assertEqual(cli.main(['convert', source, binary]), 0)
+        self.assertEqual(export.read_binary(binary), timed_tests)
+
+        for name in ('back.json', 'back.jsonl'):
+            path = os.path.join(self.tmpdir, name)
+            export.convert(binary, path)
+            self.assertEqual(export.read(path), timed_tests)
+
+    def test_iter_json(self):
+        path = os.path.join(self.tmpdir, 'timings.json')
+        timed_tests = {
+            'test_1': {'time': 0.123456789, 'status': 'success'},
+            u'test_"\xe9"(1, 2)': {'time': 1e-09, 'status': None},
+        }
+        with open(path, 'w') as f:
+            json.dump({'fixtures': {'a': [1, {'b': 2.5}]}, 'tests': timed_tests}, f, indent=1)
+
+        # values split across any number of chunks
+        for chunk_size in (1, 2, 7, 1 << 16):
+            self.assertEqual(dict(export.iter_json(path, chunk_size)), timed_tests)
+            self.assertEqual(dict(export.iter_records(path)), timed_tests)
+
+        with open(path, 'w') as f:
+            f.write('{"tests": {"test_1": {"time": 0.1}')
+        with self.assertRaises(ValueError):
+            list(export.iter_json(path))
@@ -0,0 +1,85 @@
+import os
+import shutil
+import tempfile
+import unittest
+
+from parameterized import parameterized
+
+from nosetimer import history
+
+
+class TestTimingHistory(unittest.TestCase):
+
+    def setUp(self):
+        super(TestTimingHistory, self).setUp()
+        tmpdir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, tmpdir)
+        self.history = history.TimingHistory(os.path.join(tmpdir, 'history.db'), window=3)
+        self.addCleanup(self.history.close)
+
+    def _record(self, *times):
+        for time_taken in times:
+            self.history.record([('test_1', {'time': time_taken, 'status': 'success'})])
+
+    def test_baselines_use_window(self):
+        self._record(10.0, 1.0, 2.0, 3.0)
+
+        baseline = self.history.baselines()['test_1']
+
+        self.assertEqual(baseline.samples, 3)
+        self.assertEqual(baseline.median, 2.0)
+
+    def test_baselines_empty(self):
+        self.assertEqual(self.history.baselines(), {})
+
+    @parameterized.expand([
+        (0.5, False),  # faster
+        (1.05, False),  # noise
+        (1.4, False),  # above p95 but not slow enough
+        (3.0, True),
+    ])
+    def test_is_regression(self, time_taken, expected):
+        self.history.window = 20
+        self._record(1.0, 1.1, 0.9, 1.0, 1.0, 1.05)
+        baseline = self.history.baselines()['test_1']
+
+        self.assertEqual(self.history.is_regression(time_taken, baseline), expected)
+
+    def test_failures(self):
+        self.assertEqual(self.history.failures(), set())
+        self.history.record([('test_1', {'time': 1.0, 'status': 'fail'})])
+        self.history.record([
+            ('test_1', {'time': 1.0, 'status': 'success'}),
+            ('test_2', {'time': 1.0, 'status': 'error'}),
+        ])
+
+        self.assertEqual(self.history.failures(), set(['test_2']))
+
+    def test_failure_rates(self):
+        self.history.record([('test_1', {'time': 1.0, 'status': 'fail'})])
+        for status in ('error', 'success', 'timeout', 'success'):
+            self.history.record([
+                ('test_1', {'time': 1.0, 'status': status}),
+                ('test_2', {'time': 1.0, 'status': 'success'}),
+            ])
+
+        # the first run is out of the window
+        self.assertEqual(self.history.failure_rates(), {'test_1': 1.0 / 3, 'test_2': 0.0})
+
+    def test_is_regression_not_enough_samples(self):
+        self._record(1.0, 1.0)
+        baseline = self.history.baselines()['test_1']
+
+        self.assertFalse(self.history.is_regression(10.0, baseline))
+
+    def test_regressions(self):
+        self.history.window = 20
+        self._record(1.0, 1.0, 1.0, 1.0, 1.0)
+        baselines = self.history.baselines()
+
+        found = self.history.regressions([
+            ('test_1', {'time': 3.0, 'status': 'fail'}),
+            ('test_2', {'time': 9.0, 'status': 'success'}),
+        ], baselines)
+
+        self.assertEqual([(t, s) for t, _, s, _ in found], [('test_1', 'fail')])
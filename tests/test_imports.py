@@ -0,0 +1,95 @@
+import os
+import shutil
+import sys
+import tempfile
+import types
+import unittest
+
+import mock
+
+from nosetimer import imports
+
+
+class TestImportTimer(unittest.TestCase):
+
+    def setUp(self):
+        super(TestImportTimer, self).setUp()
+        self.tmpdir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.tmpdir)
+        sys.path.insert(0, self.tmpdir)
+        self.addCleanup(sys.path.remove, self.tmpdir)
+        self.addCleanup(self._forget_modules)
+        self.timer = imports.ImportTimer()
+
+    def _forget_modules(self):
+        for name in list(sys.modules):
+            if name.split('.')[0] in ('timer_pkg', 'timer_dep'):
+                del sys.modules[name]
+
+    def _write(self, path, source=''):
+        path = os.path.join(self.tmpdir, path)
+        if not os.path.isdir(os.path.dirname(path)):
+            os.makedirs(os.path.dirname(path))
+        with open(path, 'w') as f:
+            f.write(source)
+
+    def _import(self, module):
+        # nose imports test modules without __import__
+        original = imports.builtins.__import__
+        self.timer.before_import(module)
+        try:
+            original(module)
+        finally:
+            self.timer.after_import(module)
+
+    def test_dependencies(self):
+        self._write('timer_dep.py')
+        self._write('timer_pkg/__init__.py')
+        self._write('timer_pkg/helpers.py')
+        self._write('timer_pkg/test_a.py', 'import os\nimport timer_dep\nfrom . import helpers\n')
+
+        self._import('timer_pkg.test_a')
+        self.timer.collected('timer_pkg.test_a')
+
+        record = self.timer.modules['timer_pkg.test_a']
+        self.assertEqual(record['modules'], 4)
+        # os was imported already
+        self.assertEqual(sorted(record['dependencies']), ['timer_dep', 'timer_pkg.helpers'])
+        self.assertIs(imports.builtins.__import__, self.timer._original)
+
+    def _fake_import(self, module):
+        self.timer.before_import(module)
+        sys.modules[module] = types.ModuleType(module)
+        self.timer.after_import(module)
+
+    @mock.patch('nosetimer.imports.clock.now_ns')
+    def test_nested_collection(self, now_ns):
+        now_ns.side_effect = [0, 1000000000, 1500000000, 3500000000, 4000000000, 4500000000]
+        self._fake_import('timer_pkg')
+        self._fake_import('timer_pkg.test_a')
+        self.timer.collected('timer_pkg.test_a')
+        self.timer.collected('timer_pkg')
+
+        self.assertEqual(self.timer.modules['timer_pkg']['import'], 1.0)
+        self.assertEqual(self.timer.modules['timer_pkg.test_a']['import'], 2.0)
+        self.assertEqual(self.timer.modules['timer_pkg.test_a']['collect'], 0.5)
+        # less the import and the collection of test_a
+        self.assertEqual(self.timer.modules['timer_pkg']['collect'], 1.0)
+        self.assertEqual(self.timer.total, 4.5)
+        self.assertEqual([module for module, _ in self.timer.slowest(1)], ['timer_pkg.test_a'])
+
+    def test_failed_import(self):
+        self._write('timer_pkg/__init__.py', 'raise ImportError("broken")\n')
+
+        with self.assertRaises(ImportError):
+            self._import('timer_pkg')
+        self.timer.collected('timer_pkg')
+
+        self.assertEqual(self.timer.modules['timer_pkg']['collect'], 0.0)
+        self.assertEqual(self.timer._collecting, [])
+
+    def test_absolute_name(self):
+        self.assertEqual(imports._absolute_name('os', {}, 0), 'os')
+        self.assertEqual(imports._absolute_name('b', {'__name__': 'pkg.sub.mod'}, 1), 'pkg.sub.b')
+        self.assertEqual(imports._absolute_name('b', {'__name__': 'pkg.sub', '__path__': []}, 1), 'pkg.sub.b')
+        self.assertEqual(imports._absolute_name('', {'__package__': 'pkg.sub'}, 2), 'pkg')
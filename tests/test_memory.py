@@ -0,0 +1,40 @@
+import unittest
+
+from nosetimer import memory
+
+
+class TestMemory(unittest.TestCase):
+
+    def test_rss(self):
+        self.assertGreater(memory.rss(), 0)
+        self.assertGreater(memory.max_rss(), 0)
+
+    def test_tracker(self):
+        tracker = memory.MemoryTracker()
+        tracker.start()
+        data = bytearray(64 << 20)
+        data[::4096] = b'x' * len(data[::4096])  # touch every page
+        entry = tracker.stop()
+        del data
+
+        self.assertGreater(entry['memory'], 32 << 20)
+        self.assertGreater(entry['rss_delta'], 32 << 20)
+
+    def test_tracker_not_started(self):
+        self.assertEqual(memory.MemoryTracker().stop(), {'memory': 0, 'rss_delta': 0})
+
+    @unittest.skipIf(memory.tracemalloc is None, 'tracemalloc is not available')
+    def test_tracker_tracemalloc(self):
+        memory.tracemalloc.start()
+        self.addCleanup(memory.tracemalloc.stop)
+        tracker = memory.MemoryTracker(traced_sites=1)
+        tracker.start()
+        data = [object() for _ in range(10000)]
+        entry = tracker.stop()
+
+        self.assertGreater(entry['traced_peak'], 0)
+        self.assertEqual(len(entry['allocations']), 1)
+        site, size = entry['allocations'][0]
+        self.assertIn('test_memory.py', site)
+        self.assertGreater(size, 0)
+        self.assertEqual(len(data), 10000)
@@ -1,9 +1,21 @@
+import json
 import mock
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
 import unittest
 
+from nose.case import FunctionTestCase
 from parameterized import parameterized
 
+from nosetimer import budgets
+from nosetimer import clock
+from nosetimer import export
 from nosetimer import plugin
+from nosetimer import spool
+from nosetimer import watchdog
 
 
 class TestTimerPlugin(unittest.TestCase):
@@ -15,16 +27,52 @@ class TestTimerPlugin(unittest.TestCase):
         self.plugin.timer_ok = 1000
         self.plugin.timer_warning = 2000
         self.plugin.timer_fail = None
+        self.plugin.timer_repeat = 0
         self.plugin.timer_no_color = False
+        plugin._import_features()
+        plugin._import_colors()
+        self.plugin._budgets = budgets.Budgets(self.plugin._parse_time)
         self.plugin.multiprocessing_enabled = False
+        self.plugin.timer_phases = False
+        self.plugin.timer_cpu = False
+        self.plugin.timer_memory_fail = None
+        self.plugin.jsonl_file = None
         self.plugin._timed_tests = {}
         self.test_mock = mock.MagicMock(name='test')
         self.test_mock.id.return_value = 1
         self.opts_mock = mock.MagicMock(
             name='opts',
             json_file=None,
+            timer_durations_file=None,
             timer_filter=None,
             timer_top_n=-1,
+            timer_fail=None,
+            timer_repeat=0,
+            timer_budget_file=None,
+            timer_timeout=None,
+            timer_history_file=None,
+            timer_history_window=20,
+            timer_schedule=False,
+            timer_shard=None,
+            timer_budget=None,
+            timer_order=None,
+            timer_progress=False,
+            timer_progress_file=None,
+            timer_calibrate=False,
+            multiprocess_workers=0,
+            timer_phases=False,
+            jsonl_file=None,
+            binary_file=None,
+            timer_bounded_memory=False,
+            timer_histogram=False,
+            timer_cpu=False,
+            timer_memory=False,
+            timer_memory_fail=None,
+            timer_tracemalloc=0,
+            timer_profile_dir=None,
+            timer_tree=False,
+            timer_imports=False,
+            timer_trace_file=None,
         )
 
     def test_report_enabled_false(self):
@@ -52,14 +100,326 @@ class TestTimerPlugin(unittest.TestCase):
             mock.call('[error] 16.67% test_1: 0.1000s'),
         ])
 
-    def test_report_with_queue(self):
+    def test_report_with_history(self):
         stream_mock = mock.MagicMock(name='stream')
+        tmpdir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, tmpdir)
+        self.opts_mock.timer_history_file = os.path.join(tmpdir, 'history.db')
+        self.opts_mock.timer_no_color = True
+        self.plugin.configure(self.opts_mock, None)
+        for time_taken in (0.1, 0.11, 0.1, 0.09, 0.1, 0.5):
+            self.plugin._timed_tests = {'test_1': {'time': time_taken, 'status': 'success'}}
+            self.plugin.report(stream=stream_mock)
+
+        stream_mock.writeln.assert_has_calls([
+            mock.call('Timing regressions (compared to the last 20 runs):'),
+            mock.call('[success] test_1: 0.5000s (median 0.1000s, p95 0.1080s)'),
+        ])
+
+    def test_binary_file(self):
+        tmpdir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, tmpdir)
+        self.opts_mock.binary_file = os.path.join(tmpdir, 'timings.ntb')
+        self.plugin.configure(self.opts_mock, None)
+        self.plugin._timed_tests = {
+            'test_1': {'time': 0.1, 'status': 'success'},
+            'test_2': {'time': 0.2, 'status': 'fail'},
+        }
+        self.plugin.report(stream=mock.MagicMock(name='stream'))
+
+        self.assertEqual(export.read(self.opts_mock.binary_file), self.plugin._timed_tests)
+
+    def test_lazy_imports(self):
+        # nose imports the plugin on every run, even without --with-timer
+        code = 'import sys, nosetimer.plugin; print(" ".join(m for m in {0!r} if m in sys.modules))'.format(
+            ('sqlite3', 'termcolor', 'colorama', 'mmap', 'tracemalloc', 'nosetimer.export', 'nosetimer.scheduling'))
+        root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+        output = subprocess.check_output([sys.executable, '-c', code], cwd=root)
+        self.assertEqual(output.strip(), b'')
+
+    def test_prepare_test_disabled(self):
+        self.plugin.configure(self.opts_mock, None)
+        self.assertIsNone(self.plugin.prepareTest(mock.MagicMock(name='suite')))
+
+    @mock.patch('nosetimer.plugin.scheduling.longest_first')
+    def test_prepare_test_schedule(self, longest_first):
+        tmpdir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, tmpdir)
+        self.opts_mock.json_file = os.path.join(tmpdir, 'timings.json')
+        self.opts_mock.timer_schedule = True
         self.opts_mock.multiprocess_workers = 4
         self.plugin.configure(self.opts_mock, None)
-        for data in (('test_1', 0.1, 'error'),
-                     ('test_2', 0.2, 'fail'),
-                     ('test_3', 0.3, 'success')):
-            plugin._results_queue.put(data)
+        suite = mock.MagicMock(name='suite')
+
+        # no previous timings yet
+        self.assertIsNone(self.plugin.prepareTest(suite))
+
+        self.plugin._timed_tests = {'test_1': {'time': 0.1, 'status': 'success'}}
+        self.plugin.report(stream=mock.MagicMock(name='stream'))
+
+        self.assertEqual(self.plugin.prepareTest(suite), longest_first.return_value)
+        index = longest_first.call_args[0][1]
+        self.assertEqual(index.predict('test_1'), 0.1)
+
+    @mock.patch('nosetimer.plugin.scheduling.longest_first')
+    @mock.patch('nosetimer.plugin.scheduling.shard')
+    def test_prepare_test_shard(self, shard, longest_first):
+        self.opts_mock.timer_shard = '2/3'
+        self.plugin.configure(self.opts_mock, None)
+        suite = mock.MagicMock(name='suite')
+
+        self.assertEqual(self.plugin.prepareTest(suite), shard.return_value)
+        index, k, n = shard.call_args[0][1:]
+        self.assertEqual((index.predict('test_1'), k, n), (1.0, 2, 3))
+
+        self.opts_mock.multiprocess_workers = 4
+        self.opts_mock.timer_schedule = True
+        self.plugin.configure(self.opts_mock, None)
+        self.addCleanup(self.plugin._spool.close)
+        with mock.patch.object(self.plugin, '_previous_timings', return_value=({'test_1': 0.1}, set())):
+            self.assertEqual(self.plugin.prepareTest(suite), longest_first.return_value)
+        self.assertEqual(longest_first.call_args[0][0], shard.return_value)
+
+    @mock.patch('nosetimer.plugin.scheduling.shard')
+    def test_prepare_test_shard_durations_file(self, shard):
+        tmpdir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, tmpdir)
+        durations_file = os.path.join(tmpdir, 'timings.json')
+        with open(durations_file, 'w') as f:
+            json.dump({'tests': {'test_1': {'time': 0.1, 'status': 'success'},
+                                 'test_2': {'time': 0.2, 'status': 'fail'}}}, f)
+        self.opts_mock.timer_durations_file = durations_file
+        self.opts_mock.json_file = os.path.join(tmpdir, 'shard.json')
+        self.opts_mock.timer_shard = '1/2'
+        self.plugin.configure(self.opts_mock, None)
+
+        self.plugin.prepareTest(mock.MagicMock(name='suite'))
+        index = shard.call_args[0][1]
+        self.assertAlmostEqual(index.predict('test_2'), 0.2)
+        self.assertEqual(self.plugin._failure_rates(set(['test_2'])), {'test_2': 1.0})
+
+        # the shard's own timings go to --timer-json-file only
+        self.plugin._timed_tests = {'test_1': {'time': 0.3, 'status': 'success'}}
+        self.plugin.report(stream=mock.MagicMock(name='stream'))
+        self.assertEqual(export.read_json(durations_file)['test_1']['time'], 0.1)
+        self.assertEqual(export.read_json(self.opts_mock.json_file), {'test_1': {'time': 0.3, 'status': 'success'}})
+
+    @mock.patch('nosetimer.plugin.scheduling.reorder')
+    def test_prepare_test_order(self, reorder):
+        self.opts_mock.timer_order = 'shortest'
+        self.plugin.configure(self.opts_mock, None)
+        suite = mock.MagicMock(name='suite')
+
+        # no previous timings yet
+        self.assertIsNone(self.plugin.prepareTest(suite))
+
+        with mock.patch.object(self.plugin, '_previous_timings', return_value=({'test_1': 0.1}, set(['test_2']))):
+            self.assertEqual(self.plugin.prepareTest(suite), reorder.return_value)
+        args, kwargs = reorder.call_args
+        self.assertEqual((args[0], args[2], kwargs), (suite, set(['test_2']), {'longest': False}))
+
+    @mock.patch('nosetimer.plugin.scheduling.select')
+    def test_prepare_test_budget(self, select):
+        self.opts_mock.timer_budget = '90s'
+        self.plugin.configure(self.opts_mock, None)
+        suite = mock.MagicMock(name='suite')
+        select.return_value = (mock.sentinel.selected, [('test_2', 60.0), ('test_3', 100.0)])
+
+        # no previous timings yet
+        with mock.patch.object(self.plugin, '_previous_timings', return_value=({}, set())):
+            self.assertIsNone(self.plugin.prepareTest(suite))
+
+        with mock.patch.object(self.plugin, '_previous_timings', return_value=({'test_1': 0.1}, set(['test_2']))):
+            self.assertEqual(self.plugin.prepareTest(suite), mock.sentinel.selected)
+        self.assertEqual(select.call_args[0], (suite, {'test_1': 0.1}, {'test_2': 1.0}, 90.0))
+
+        stream = mock.MagicMock(name='stream')
+        self.plugin._timed_tests = {}
+        self.plugin.report(stream)
+        stream.writeln.assert_has_calls([
+            mock.call('Skipped to fit in 90.0000s: 2 tests or suites, 160.0000s predicted'),
+            mock.call('test_3: 100.0000s'),
+            mock.call('test_2: 60.0000s'),
+        ])
+
+    @mock.patch('nosetimer.plugin.progress.Progress')
+    def test_progress(self, progress_mock):
+        self.opts_mock.timer_progress = True
+        self.plugin.configure(self.opts_mock, mock.Mock(spec=['verbosity'], verbosity=2))
+        suite = unittest.TestSuite([unittest.FunctionTestCase(lambda: None)])
+
+        with mock.patch.object(self.plugin, '_previous_timings', return_value=({'test_1': 0.1}, set())):
+            prepared = self.plugin.prepareTest(suite)
+
+        self.assertEqual(len(list(prepared)), 1)
+        self.assertEqual(progress_mock.call_args[0][4], 2)
+        progress_mock.return_value.start.assert_called_once_with()
+        with mock.patch.object(self.plugin, '_time_taken', return_value=0.2):
+            self.plugin.startTest(self.test_mock)
+            self.plugin.addSuccess(self.test_mock)
+            self.plugin.afterTest(self.test_mock)
+        progress_mock.return_value.tick.assert_called_once_with()
+        progress_mock.return_value.start_test.assert_called_once_with(1)
+        progress_mock.return_value.add.assert_called_once_with(1, 0.2)
+        self.plugin.report(mock.MagicMock(name='stream'))
+        progress_mock.return_value.close.assert_called_once_with()
+
+    @mock.patch('nosetimer.plugin.progress.Progress')
+    def test_progress_file(self, progress_mock):
+        tmpdir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, tmpdir)
+        self.opts_mock.timer_progress_file = os.path.join(tmpdir, 'progress.log')
+        self.plugin.configure(self.opts_mock, mock.Mock(spec=['verbosity'], verbosity=2))
+
+        with mock.patch.object(self.plugin, '_previous_timings', return_value=({}, set())):
+            self.plugin.prepareTest(unittest.TestSuite())
+
+        # live, whatever the verbosity of nose
+        stream, _, _, _, verbosity, live = progress_mock.call_args[0]
+        self.assertEqual((stream.name, verbosity, live), (self.opts_mock.timer_progress_file, 0, None))
+        progress_mock.return_value.stream = stream
+        self.plugin.report(mock.MagicMock(name='stream'))
+        self.assertTrue(stream.closed)
+
+    @mock.patch('nosetimer.plugin.progress.Progress')
+    def test_progress_multiprocess(self, progress_mock):
+        self.opts_mock.timer_progress = True
+        self.opts_mock.multiprocess_workers = 2
+        self.plugin.configure(self.opts_mock, mock.Mock(spec=['verbosity'], verbosity=2))
+        self.addCleanup(self.plugin._spool.close)
+
+        with mock.patch.object(self.plugin, '_previous_timings', return_value=({}, set())):
+            self.plugin.prepareTest(unittest.TestSuite())
+
+        stream, _, _, follow, verbosity, live = progress_mock.call_args[0]
+        self.assertEqual((stream, follow, verbosity, live), (sys.stderr, self.plugin._spool.follow, 2, True))
+
+    @parameterized.expand(['0/3', '4/3', '1', 'a/b'])
+    def test_parse_shard_error(self, value):
+        self.assertRaises(ValueError, self.plugin._parse_shard, value)
+
+    def test_report_bounded_memory(self):
+        stream_mock = mock.MagicMock(name='stream')
+        self.opts_mock.timer_top_n = 2
+        self.opts_mock.timer_bounded_memory = True
+        self.opts_mock.timer_no_color = True
+        self.plugin.configure(self.opts_mock, None)
+        with mock.patch.object(self.plugin, '_time_taken') as _time_taken:
+            for i, time_taken in enumerate((0.1, 0.4, 0.2, 0.3)):
+                _time_taken.return_value = time_taken
+                self.test_mock.id.return_value = 'test_{0}'.format(i)
+                self.plugin.addSuccess(self.test_mock)
+
+        self.assertEqual(list(self.plugin._timed_tests), ['test_3'])
+        self.plugin.report(stream=stream_mock)
+
+        self.assertEqual(stream_mock.writeln.call_args_list, [
+            mock.call('[success] 40.00% test_1: 0.4000s'),
+            mock.call('[success] 30.00% test_3: 0.3000s'),
+        ])
+
+    def test_report_histogram(self):
+        stream_mock = mock.MagicMock(name='stream')
+        self.opts_mock.timer_histogram = True
+        self.plugin.configure(self.opts_mock, None)
+        with mock.patch.object(self.plugin, '_time_taken') as _time_taken:
+            for test_id, time_taken in (('a.test_1', 0.001), ('a.test_2', 0.002), ('b.test_3', 0.01)):
+                _time_taken.return_value = time_taken
+                self.test_mock.id.return_value = test_id
+                self.plugin.startTest(self.test_mock)
+                self.plugin.addSuccess(self.test_mock)
+                self.plugin.afterTest(self.test_mock)
+            self.plugin.startTest(self.test_mock)
+            self.plugin.addFailure(self.test_mock, None)
+            self.plugin.afterTest(self.test_mock)
+        stream_mock.writeln.reset_mock()
+
+        self.plugin._report_histograms(stream_mock)
+
+        lines = [c[0][0] for c in stream_mock.writeln.call_args_list]
+        self.assertEqual(lines[:6], [
+            'Duration distribution:',
+            'all: 4 tests, p50 2.05ms, p90 10ms, p99 10ms, max 10ms',
+            '[success]: 3 tests, p50 2.05ms, p90 10ms, p99 10ms, max 10ms',
+            'a: 2 tests, p50 1.03ms, p90 2ms, p99 2ms, max 2ms',
+            'b: 2 tests, p50 10ms, p90 10ms, p99 10ms, max 10ms',
+            '[fail]: 1 tests, p50 10ms, p90 10ms, p99 10ms, max 10ms',
+        ])
+        self.assertEqual(lines[6], '     1ms |####################                    | 1')
+
+    def test_report_tree(self):
+        stream_mock = mock.MagicMock(name='stream')
+        self.opts_mock.timer_tree = True
+        self.plugin.configure(self.opts_mock, None)
+        self.plugin._fixture_times = {'a.mod': {'setup': 0.5, 'teardown': 0.5}}
+        with mock.patch.object(self.plugin, '_time_taken') as _time_taken:
+            for test_id, time_taken in (('a.mod.Case.test_1', 1.0), ('a.mod.test_2', 2.0), ('b.test_3', 1.0)):
+                _time_taken.return_value = time_taken
+                self.test_mock.id.return_value = test_id
+                self.plugin.addSuccess(self.test_mock)
+
+        self.plugin.report(stream_mock)
+
+        lines = [c[0][0] for c in stream_mock.writeln.call_args_list]
+        self.assertEqual(lines[3:], [
+            'Tree:',
+            'a: 4.0000s (80.00%, 2 tests, self 0.0000s)',
+            '  mod: 4.0000s (80.00%, 2 tests, self 1.0000s)',
+            '    Case: 1.0000s (20.00%, 1 tests, self 0.0000s)',
+            'b: 1.0000s (20.00%, 1 tests, self 0.0000s)',
+        ])
+
+    def test_report_imports(self):
+        stream_mock = mock.MagicMock(name='stream')
+        self.opts_mock.timer_imports = True
+        self.plugin.configure(self.opts_mock, None)
+        self.plugin._imports.modules = {
+            'tests.test_db': {'import': 1.5, 'collect': 0.5, 'modules': 84,
+                              'dependencies': {'sqlalchemy': 1.0, 'json': 0.1, 'tests.helpers': 0.2, 'os': 0.0}},
+            'tests.test_util': {'import': 0.25, 'collect': 0.0, 'modules': 1, 'dependencies': {}},
+        }
+
+        self.plugin.report(stream_mock)
+
+        lines = [c[0][0] for c in stream_mock.writeln.call_args_list]
+        self.assertEqual(lines, [
+            'Imports:',
+            'tests.test_db: 2.0000s (import 1.5000s, collect 0.5000s, 84 new modules)',
+            '  sqlalchemy: 1.0000s',
+            '  tests.helpers: 0.2000s',
+            '  json: 0.1000s',
+            'tests.test_util: 0.2500s (import 0.2500s, collect 0.0000s, 1 new modules)',
+            'Total: 2.2500s (2 modules)',
+        ])
+
+    def test_import_hooks(self):
+        self.opts_mock.timer_imports = True
+        self.plugin.configure(self.opts_mock, mock.MagicMock(name='config', worker=True))
+        self.assertIsNone(self.plugin._imports)
+
+        self.plugin.configure(self.opts_mock, None)
+        with mock.patch.object(self.plugin, '_imports') as imports_mock:
+            self.plugin.beforeImport('tests/test_db.py', 'tests.test_db')
+            self.plugin.afterImport('tests/test_db.py', 'tests.test_db')
+            self.assertIsNone(self.plugin.loadTestsFromModule(mock.MagicMock(__name__='tests.test_db')))
+
+        imports_mock.before_import.assert_called_once_with('tests.test_db')
+        imports_mock.after_import.assert_called_once_with('tests.test_db')
+        imports_mock.collected.assert_called_once_with('tests.test_db')
+
+    def test_report_with_spool(self):
+        stream_mock = mock.MagicMock(name='stream')
+        config_mock = mock.MagicMock(name='config', spec=[])
+        self.opts_mock.multiprocess_workers = 4
+        self.plugin.configure(self.opts_mock, config_mock)
+        worker = plugin.TimerPlugin()
+        worker.enabled = True
+        worker.configure(self.opts_mock, config_mock)
+        self.assertEqual(worker._spool.path, self.plugin._spool.path)
+        for k, v, s in (('test_1', 0.1, 'error'),
+                        ('test_2', 0.2, 'fail'),
+                        ('test_3', 0.3, 'success')):
+            worker._spool.put({'id': k, 'time': v, 'status': s})
 
         self.plugin.report(stream=stream_mock)
 
@@ -69,7 +429,80 @@ class TestTimerPlugin(unittest.TestCase):
             mock.call('[error] 16.67% test_1: 0.1000s'),
         ])
 
-    def test_report_with_queue_empty(self):
+    def test_report_workers(self):
+        tmpdir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, tmpdir)
+        stream_mock = mock.MagicMock(name='stream')
+        config_mock = mock.MagicMock(name='config', spec=[])
+        self.opts_mock.multiprocess_workers = 2
+        self.opts_mock.timer_trace_file = os.path.join(tmpdir, 'trace.json')
+        self.plugin.configure(self.opts_mock, config_mock)
+        self.assertTrue(self.plugin._time_fixtures)
+        for k, pid, start, end in (('test_1', 10, 100.0, 101.0),
+                                   ('test_2', 20, 100.0, 100.5),
+                                   ('test_3', 10, 101.0, 104.0)):
+            self.plugin._spool.put({'id': k, 'time': end - start, 'status': 'success',
+                                    'pid': pid, 'start': start, 'end': end})
+        self.plugin._spool.put({'span': 'tests', 'phase': 'setup', 'pid': 20, 'start': 100.5, 'end': 101.0})
+
+        self.plugin.report(stream=stream_mock)
+
+        lines = [c[0][0] for c in stream_mock.writeln.call_args_list]
+        self.assertEqual(lines[3:], [
+            'Workers: 2 processes over 4.0000s, 62.50% utilized',
+            'pid 10: 2 tests, busy 4.0000s (100.00%), idle 0.0000s, finished at 4.0000s',
+            'pid 20: 1 tests, busy 1.0000s (25.00%), idle 3.0000s, finished at 1.0000s',
+        ])
+        with open(self.opts_mock.timer_trace_file) as f:
+            self.assertEqual(len(json.load(f)['traceEvents']), 8)
+
+    @mock.patch('nosetimer.plugin.os.getpid', return_value=10)
+    @mock.patch('nosetimer.plugin.clock.timestamp', side_effect=lambda ns: ns / 1e9)
+    def test_timeline_entries(self, timestamp, getpid):
+        self.opts_mock.timer_trace_file = 'trace.json'
+        self.plugin.configure(self.opts_mock, None)
+        with mock.patch('nosetimer.plugin.clock.now_ns', side_effect=[t * 10 ** 9 for t in (0, 1, 1, 3, 3)]):
+            self.plugin.startContext(plugin)
+            self.plugin.startTest(self.test_mock)
+            self.plugin.addSuccess(self.test_mock)
+            self.plugin.afterTest(self.test_mock)
+
+        self.assertEqual(self.plugin._timed_tests[1], {
+            'time': 2.0, 'status': 'success', 'pid': 10, 'start': 1.0, 'end': 3.0,
+        })
+        self.assertEqual(self.plugin._timeline.tests, [(1, 10, 1.0, 3.0, 'success')])
+        self.assertEqual(self.plugin._timeline.spans, [('nosetimer.plugin', 'setup', 10, 0.0, 1.0)])
+
+    @parameterized.expand([
+        (0, (0, 0, 2.5, 2.5), '2.5000s'),
+        # the rerun keeps the worker busy
+        (1, (0, 0, 2.5, 2.5, 5.0, 5.0), '5.0000s'),
+    ])
+    @mock.patch('nosetimer.plugin.os.getpid', return_value=10)
+    @mock.patch('nosetimer.plugin.clock.timestamp', side_effect=lambda ns: ns / 1e9)
+    def test_report_workers_failed_by_add_success(self, repeat, times, busy, timestamp, getpid):
+        stream_mock = mock.MagicMock(name='stream')
+        self.opts_mock.multiprocess_workers = 2
+        self.opts_mock.timer_fail = 'error'
+        self.opts_mock.timer_trace_file = 'trace.json'
+        self.opts_mock.timer_repeat = repeat
+        self.plugin.configure(self.opts_mock, mock.MagicMock(name='config', spec=[]))
+        with mock.patch('nosetimer.plugin.clock.now_ns', side_effect=[t * 10 ** 9 for t in times]):
+            self.plugin.startTest(self.test_mock)
+            self.plugin.addSuccess(self.test_mock)
+            self.plugin.addError(self.test_mock, None)
+        self.plugin.timer_trace_file = None
+
+        self.plugin.report(stream=stream_mock)
+
+        self.assertTrue(self.test_mock.fail.called)
+        lines = [c[0][0] for c in stream_mock.writeln.call_args_list]
+        self.assertEqual(lines[-2:], [
+            'Workers: 1 processes over {0}, 100.00% utilized'.format(busy),
+            'pid 10: 1 tests, busy {0} (100.00%), idle 0.0000s, finished at {0}'.format(busy),
+        ])
+
+    def test_report_with_spool_empty(self):
         stream_mock = mock.MagicMock(name='stream')
         self.opts_mock.multiprocess_workers = 4
         self.plugin.configure(self.opts_mock, None)
@@ -125,7 +558,10 @@ class TestTimerPlugin(unittest.TestCase):
 
     def test_add_success(self):
         self.plugin.multiprocessing_enabled = True
+        self.plugin._spool = spool.ResultSpool.create()
+        self.addCleanup(self.plugin._spool.close)
         self.plugin.addSuccess(self.test_mock, None)
+        self.plugin.afterTest(self.test_mock)
 
         self.assertEqual(
             self.plugin._timed_tests,
@@ -136,7 +572,111 @@ class TestTimerPlugin(unittest.TestCase):
                 },
             },
         )
-        self.assertEqual(plugin._results_queue.get(), (1, 0.0, 'success'))
+        self.assertEqual(list(self.plugin._spool), [{'id': 1, 'time': 0.0, 'status': 'success'}])
+
+    @mock.patch('nosetimer.plugin.clock.now_ns')
+    def test_phases(self, now_ns):
+        now_ns.side_effect = [t * 10 ** 9 for t in (0, 0, 1, 3, 10, 11, 12, 12)]
+        self.plugin.timer_phases = True
+        self.plugin._time_fixtures = True
+
+        class Case(unittest.TestCase):
+            def setUp(self):
+                pass
+
+            def tearDown(self):
+                pass
+
+            def runTest(self):
+                pass
+
+        case = Case()
+        self.test_mock.test = case
+        self.plugin.startTest(self.test_mock)
+        case.setUp()
+        case.tearDown()
+        self.plugin.addSuccess(self.test_mock)
+        self.plugin.stopTest(self.test_mock)
+
+        self.assertEqual(self.plugin._timed_tests[1], {
+            'time': 12, 'status': 'success', 'setup': 2, 'call': 9, 'teardown': 1,
+        })
+        self.assertNotIn('setUp', case.__dict__)
+        self.assertNotIn('tearDown', case.__dict__)
+
+    @mock.patch('nosetimer.plugin._cpu_times')
+    def test_cpu(self, cpu_times):
+        cpu_times.side_effect = [(1.0, 0.5, 0.25), (1.5, 0.75, 0.5)]
+        self.plugin.timer_cpu = True
+        self.plugin.startTest(self.test_mock)
+
+        with mock.patch.object(self.plugin, '_time_taken') as _time_taken:
+            _time_taken.return_value = 1.0
+            self.plugin.addSuccess(self.test_mock)
+
+        self.assertEqual(self.plugin._timed_tests[1], {
+            'time': 1.0, 'status': 'success', 'cpu': 0.75, 'user': 0.5, 'sys': 0.25, 'wait': 0.25, 'thread': 0.25,
+        })
+        self.assertEqual(
+            self.plugin._format_report_line('test_1', 1.0, None, 'success', 100, self.plugin._timed_tests[1]),
+            '[success] 100.00% test_1: 1.0000s (cpu 0.7500s, wait 0.2500s)',
+        )
+
+    def test_cpu_times(self):
+        user, system, thread = plugin._cpu_times()
+        self.assertGreater(user + system, 0)
+
+    @mock.patch('nosetimer.plugin.clock.now_ns')
+    def test_fixture_times(self, now_ns):
+        now_ns.side_effect = [t * 10 ** 9 for t in (0, 1, 3, 3, 5, 6, 8)]
+        self.plugin.timer_phases = True
+        self.plugin._time_fixtures = True
+        self.test_mock.test = None
+
+        self.plugin.startContext(plugin)  # module
+        self.plugin.startContext(plugin.TimerPlugin)  # class
+        self.plugin.startTest(self.test_mock)
+        self.plugin.stopTest(self.test_mock)
+        self.plugin.stopContext(plugin.TimerPlugin)
+        self.plugin.stopContext(plugin)
+
+        self.assertEqual(self.plugin._fixture_times, {
+            'nosetimer.plugin': {'setup': 1, 'teardown': 2},
+            'nosetimer.plugin.TimerPlugin': {'setup': 2, 'teardown': 1},
+        })
+
+    def test_report_phases(self):
+        stream_mock = mock.MagicMock(name='stream')
+        self.opts_mock.timer_phases = True
+        self.opts_mock.timer_no_color = True
+        self.plugin.configure(self.opts_mock, None)
+        self.plugin._timed_tests = {
+            'test_1': {'time': 0.3, 'status': 'success', 'setup': 0.1, 'call': 0.15, 'teardown': 0.05},
+        }
+        self.plugin._fixture_times = {'tests': {'setup': 0.5, 'teardown': 0.25}}
+
+        self.plugin.report(stream=stream_mock)
+
+        stream_mock.writeln.assert_has_calls([
+            mock.call('[success] 100.00% test_1: 0.3000s (setup 0.1000s, call 0.1500s, teardown 0.0500s)'),
+            mock.call('Fixtures:'),
+            mock.call('tests: 0.7500s (setup 0.5000s, teardown 0.2500s)'),
+        ])
+
+    def test_jsonl_file(self):
+        tmpdir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, tmpdir)
+        self.opts_mock.jsonl_file = os.path.join(tmpdir, 'timings.jsonl')
+        with open(self.opts_mock.jsonl_file, 'w') as f:
+            f.write('{"id":"old","time":1.0,"status":"success"}\n')
+        self.plugin.configure(self.opts_mock, None)
+        self.plugin.begin()
+
+        self.plugin.addSuccess(self.test_mock)
+        self.plugin.addFailure(self.test_mock, None)
+        self.plugin.finalize(None)
+
+        self.assertEqual(export.read_jsonl(self.opts_mock.jsonl_file), {1: {'time': 0.0, 'status': 'fail'}})
 
     def test_prepare_test_result_show_all(self):
         stream_mock = mock.MagicMock(name='stream')
@@ -183,9 +723,9 @@ class TestTimerPlugin(unittest.TestCase):
         parser = mock.MagicMock()
         self.plugin.options(parser)
         if not plugin.IS_NT:
-            self.assertEqual(parser.add_option.call_count, 8)
+            self.assertEqual(parser.add_option.call_count, 34)
         else:
-            self.assertEqual(parser.add_option.call_count, 7)
+            self.assertEqual(parser.add_option.call_count, 33)
 
     def test_configure(self):
         attributes = ('config', 'timer_top_n')
@@ -204,6 +744,24 @@ class TestTimerPlugin(unittest.TestCase):
         self.assertTrue(hasattr(self.plugin, '_timer'))
         self.assertNotEqual(self.plugin._time_taken(), 0.0)
 
+    @mock.patch('nosetimer.plugin.clock.now_ns')
+    def test_calibrate(self, now_ns):
+        self.opts_mock.timer_calibrate = True
+        with mock.patch('nosetimer.plugin.clock.Calibration.measure') as measure:
+            measure.return_value = clock.Calibration([1000, 1500, 3000], 1)
+            self.plugin.configure(self.opts_mock, None)
+
+        now_ns.side_effect = [0, 1200, 0, 500]
+        self.plugin.startTest(self.test_mock)
+        self.assertEqual(self.plugin._time_taken(), 200e-9)
+        # never below zero
+        self.plugin.startTest(self.test_mock)
+        self.assertEqual(self.plugin._time_taken(), 0.0)
+
+        stream_mock = mock.MagicMock(name='stream')
+        self.plugin.report(stream_mock)
+        stream_mock.writeln.assert_any_call('Timer: resolution 1ns, overhead 1us subtracted, uncertainty 1.85us')
+
     @parameterized.expand([
         ('1', 1000),  # seconds by default
         ('2s', 2000),  # seconds
@@ -212,6 +770,57 @@ class TestTimerPlugin(unittest.TestCase):
     def test_parse_time(self, value, expected_ms):
         self.assertEqual(self.plugin._parse_time(value), expected_ms)
 
+    @parameterized.expand([
+        ('1', 1 << 20),  # megabytes by default
+        ('512kb', 512 << 10),
+        ('1.5GB', 3 << 29),
+        ('100B', 100),
+    ])
+    def test_parse_size(self, value, expected_bytes):
+        self.assertEqual(self.plugin._parse_size(value), expected_bytes)
+
+    def test_parse_size_error(self):
+        self.assertRaises(ValueError, self.plugin._parse_size, '5 megs')
+
+    def test_memory_fail(self):
+        self.opts_mock.timer_memory_fail = '1MB'
+        self.plugin.configure(self.opts_mock, None)
+        with mock.patch.object(self.plugin._memory, 'stop') as stop:
+            stop.return_value = {'memory': 2 << 20, 'rss_delta': -(1 << 20)}
+            self.plugin.startTest(self.test_mock)
+            self.plugin.addSuccess(self.test_mock)
+
+        self.test_mock.fail.assert_called_once_with(
+            'Test used too much memory (peak grew by 2MB, threshold was 1MB)')
+        self.assertEqual(
+            self.plugin._format_report_line('test_1', 1.0, None, 'success', 100, {
+                'memory': 2 << 20, 'rss_delta': -(1 << 20), 'allocations': [['test.py:1', 2048]],
+            }),
+            '[success] 100.00% test_1: 1.0000s (memory +2MB peak, -1MB retained)\n    +2KB test.py:1',
+        )
+
+    def test_profile_dir(self):
+        tmpdir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, tmpdir)
+        self.opts_mock.timer_profile_dir = os.path.join(tmpdir, 'profiles')
+        self.plugin.configure(self.opts_mock, None)
+        self.addCleanup(self.plugin.finalize, None)
+        self.assertTrue(os.path.isdir(self.opts_mock.timer_profile_dir))
+
+        with mock.patch.object(self.plugin._sampler, 'stop') as stop:
+            stop.return_value = {'test;slow': 3}
+            with mock.patch.object(self.plugin, '_time_taken') as _time_taken:
+                for test_id, time_taken in (('test_fast', 0.5), ('test_slow', 5)):
+                    _time_taken.return_value = time_taken
+                    self.test_mock.id.return_value = test_id
+                    self.plugin.startTest(self.test_mock)
+                    self.plugin.addSuccess(self.test_mock)
+
+        self.assertEqual(os.listdir(self.opts_mock.timer_profile_dir), ['test_slow.folded'])
+        self.assertNotIn('profile', self.plugin._timed_tests['test_fast'])
+        with open(self.plugin._timed_tests['test_slow']['profile']) as f:
+            self.assertEqual(f.read(), 'test;slow 3\n')
+
     def test_parse_time_error(self):
         self.assertRaises(ValueError, self.plugin._parse_time, '5seconds')
 
@@ -223,7 +832,8 @@ class TestTimerPlugin(unittest.TestCase):
         time = '100ms'
         with mock.patch.object(self.plugin, '_parse_time') as parse_time:
             parse_time.return_value = time
-            mock_opts = mock.MagicMock(**{option: time})
+            mock_opts = self.opts_mock
+            setattr(mock_opts, option, time)
             self.plugin.configure(mock_opts, None)
             self.assertEqual(getattr(mock_opts, option), time)
             parse_time.has_call(time)
@@ -260,6 +870,143 @@ class TestTimerPlugin(unittest.TestCase):
         self.assertEqual(self.plugin._colored_time(1), "1.0000s")
         self.assertFalse(colored_mock.called)
 
+    @parameterized.expand([
+        ([1.5, 0.5, 0.8], False),  # a fluke
+        ([1.5, 1.2, 0.8], True),
+    ])
+    @mock.patch('nosetimer.plugin.clock.now_ns')
+    def test_timer_repeat(self, times, fail_expected, now_ns):
+        self.plugin.timer_fail = 'warning'
+        self.plugin.timer_repeat = 2
+        now_ns.side_effect = [0, int(times[1] * 1e9), 0, int(times[2] * 1e9)]
+        with mock.patch.object(self.plugin, '_time_taken') as _time_taken:
+            _time_taken.return_value = times[0]
+            self.plugin.addSuccess(self.test_mock)
+
+        self.assertEqual(self.test_mock.test.debug.call_count, 2)
+        self.assertEqual(self.test_mock.fail.called, fail_expected)
+        entry = self.plugin._timed_tests[1]
+        self.assertEqual((entry['time'], entry['min'], entry['runs']), (sorted(times)[1], min(times), 3))
+        self.assertIn('(median of 3 runs, min ', self.plugin._format_report_line(1, 1, None, 'success', 100, entry))
+
+    @parameterized.expand([
+        (0.004, False),
+        (0.006, True),
+    ])
+    def test_budget(self, time_taken, fail_expected):
+        self.test_mock.test = FunctionTestCase(budgets.budget('5ms')(lambda: None))
+        with mock.patch.object(self.plugin, '_time_taken') as _time_taken:
+            _time_taken.return_value = time_taken
+            self.plugin.addSuccess(self.test_mock)
+
+        self.assertEqual(self.test_mock.fail.called, fail_expected)
+        if fail_expected:
+            self.test_mock.fail.assert_called_with('Test was too slow (took 0.0060s, threshold was 0.0050s)')
+
+    def test_budget_file(self):
+        tmpdir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, tmpdir)
+        self.opts_mock.timer_budget_file = os.path.join(tmpdir, 'budgets')
+        with open(self.opts_mock.timer_budget_file, 'w') as f:
+            f.write('test_* 500ms\n')
+        self.plugin.configure(self.opts_mock, None)
+        self.test_mock.id.return_value = 'test_1'
+
+        self.assertEqual(self.plugin._time_limit(self.test_mock), 500.0)
+
+    def test_timeout(self):
+        self.opts_mock.timer_timeout = '50ms'
+        self.plugin.configure(self.opts_mock, None)
+        self.assertEqual(self.plugin._watchdog.timeout, 0.05)
+
+        with mock.patch.object(self.plugin, '_watchdog') as watchdog_mock:
+            self.plugin.startTest(self.test_mock)
+            watchdog_mock.start.assert_called_once_with()
+            self.plugin.addError(self.test_mock, (watchdog.TestTimeout, watchdog.TestTimeout(), None))
+            self.plugin.stopTest(self.test_mock)
+            self.assertTrue(watchdog_mock.cancel.called)
+
+        self.assertEqual(self.plugin._timed_tests[1]['status'], 'timeout')
+
+    def test_failed_by_add_success_registered_once(self):
+        tmpdir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, tmpdir)
+        self.opts_mock.timer_fail = 'error'
+        self.opts_mock.timer_top_n = 5
+        self.opts_mock.timer_bounded_memory = True
+        self.opts_mock.timer_tree = True
+        self.opts_mock.timer_histogram = True
+        self.opts_mock.jsonl_file = os.path.join(tmpdir, 'timings.jsonl')
+        self.plugin.configure(self.opts_mock, None)
+        self.test_mock.id.return_value = 'pkg.test_slow'
+
+        with mock.patch.object(self.plugin, '_time_taken', return_value=2.5):
+            self.plugin.startTest(self.test_mock)
+            self.plugin.addSuccess(self.test_mock)
+            self.plugin.stopTest(self.test_mock)
+            # nose reports the failure raised by addSuccess as an error, after stopTest
+            self.plugin.addError(self.test_mock, None)
+            self.plugin.afterTest(self.test_mock)
+        self.plugin.finalize(None)
+
+        self.assertTrue(self.test_mock.fail.called)
+        self.assertEqual(self.plugin._top.items(), [('pkg.test_slow', {'time': 2.5, 'status': 'error'})])
+        self.assertEqual(self.plugin._tree.count, 1)
+        histograms = dict((key, histogram.count) for key, histogram in self.plugin._histograms.items())
+        self.assertEqual(histograms, {'all': 1, '[error]': 1, 'pkg': 1})
+        self.assertEqual(list(export.iter_jsonl(self.opts_mock.jsonl_file)),
+                         [('pkg.test_slow', {'time': 2.5, 'status': 'error'})])
+
+    def test_failed_by_add_success_multiprocess(self):
+        stream_mock = mock.MagicMock(name='stream')
+        self.opts_mock.timer_fail = 'error'
+        self.opts_mock.timer_no_color = True
+        self.opts_mock.multiprocess_workers = 2
+        self.plugin.configure(self.opts_mock, mock.MagicMock(name='config', spec=[]))
+        self.test_mock.id.return_value = 'pkg.test_slow'
+
+        with mock.patch.object(self.plugin, '_time_taken', return_value=2.5):
+            self.plugin.startTest(self.test_mock)
+            self.plugin.addSuccess(self.test_mock)
+            self.plugin.stopTest(self.test_mock)
+            self.plugin.addError(self.test_mock, None)
+            self.plugin.afterTest(self.test_mock)
+        self.assertEqual([(r['id'], r['status']) for r in self.plugin._spool], [('pkg.test_slow', 'error')])
+        # the main process only knows the tests from the spool
+        self.plugin._timed_tests = {}
+
+        self.plugin.report(stream=stream_mock)
+
+        self.assertEqual(self.plugin._timed_tests['pkg.test_slow']['status'], 'error')
+        stream_mock.writeln.assert_any_call('[error] 100.00% pkg.test_slow: 2.5000s')
+
+    @mock.patch('nosetimer.plugin.clock.now_ns')
+    def test_timer_repeat_then_fail(self, now_ns):
+        self.plugin.timer_fail = 'warning'
+        self.plugin.timer_repeat = 2
+        # start, then each rerun
+        now_ns.side_effect = [0, 0, int(1.2e9), 0, int(1.4e9)]
+        with mock.patch.object(self.plugin, '_time_taken', return_value=1.5):
+            self.plugin.startTest(self.test_mock)
+            self.plugin.addSuccess(self.test_mock)
+            self.plugin.addError(self.test_mock, None)
+
+        self.test_mock.fail.assert_called_with('Test was too slow (took 1.4000s, threshold was 1.0000s)')
+        self.assertEqual(self.plugin._timed_tests[1], {
+            'time': 1.4, 'status': 'error', 'min': 1.2, 'stdev': mock.ANY, 'runs': 3,
+        })
+
+    def test_timer_repeat_error(self):
+        self.plugin.timer_fail = 'warning'
+        self.plugin.timer_repeat = 2
+        self.test_mock.test.debug.side_effect = AssertionError
+        with mock.patch.object(self.plugin, '_time_taken') as _time_taken:
+            _time_taken.return_value = 1.5
+            self.plugin.addSuccess(self.test_mock)
+
+        self.assertTrue(self.test_mock.fail.called)
+        self.assertEqual(self.plugin._timed_tests[1]['runs'], 1)
+
     @parameterized.expand([
         ('warning', 0.5, False),
         ('warning', 1.5, True),
@@ -0,0 +1,49 @@
+import os
+import shutil
+import tempfile
+import time
+import unittest
+
+from nosetimer import profiler
+
+
+def _busy(seconds):
+    end = time.time() + seconds
+    while time.time() < end:
+        pass
+
+
+class TestStackSampler(unittest.TestCase):
+
+    def setUp(self):
+        super(TestStackSampler, self).setUp()
+        self.sampler = profiler.StackSampler(interval=0.001)
+        self.addCleanup(self.sampler.close)
+
+    def test_sample(self):
+        self.sampler.start()
+        _busy(0.1)
+        counts = self.sampler.stop()
+
+        busy = sum(count for stack, count in counts.items() if stack.split(';')[-1].startswith('_busy'))
+        # a few samples may land in start() or stop()
+        self.assertGreater(busy, sum(counts.values()) / 2)
+        self.assertIn('test_sample', [frame.split()[0] for frame in list(counts)[0].split(';')])
+
+    def test_stop_discards(self):
+        self.sampler.start()
+        _busy(0.02)
+        self.sampler.stop()
+        _busy(0.02)
+
+        self.assertEqual(self.sampler.stop(), {})
+
+    def test_write_folded(self):
+        tmpdir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, tmpdir)
+
+        path = profiler.write_folded(tmpdir, 'tests.test_x(1, "a/b")', {'a;b': 2, 'a': 1})
+
+        self.assertEqual(os.path.basename(path), 'tests.test_x_1_a_b_.folded')
+        with open(path) as f:
+            self.assertEqual(f.read(), 'a 1\na;b 2\n')
@@ -0,0 +1,105 @@
+import time
+import unittest
+
+import mock
+from parameterized import parameterized
+
+from nosetimer import progress
+
+
+class TestProgress(unittest.TestCase):
+
+    def setUp(self):
+        super(TestProgress, self).setUp()
+        self.stream = mock.MagicMock(name='stream')
+        self.stream.isatty.return_value = False
+        patcher = mock.patch('nosetimer.progress.timeit.default_timer', return_value=0.0)
+        self.default_timer = patcher.start()
+        self.addCleanup(patcher.stop)
+        self.progress = progress.Progress(self.stream, {'test_1': 1.0, 'test_2': 3.0}, 4.0)
+
+    def test_line(self):
+        self.assertEqual(self.progress.line(0.0), '  0% | 0 tests | 0ns elapsed')
+
+        self.progress.add('test_1', 3.0)
+        self.progress.start_test('test_2')
+
+        self.assertEqual(
+            self.progress.line(2.0),
+            ' 25% | 1 tests | 2s elapsed | ~6s left | 1 slower than usual | running test_2 for 2s',
+        )
+        self.assertEqual(
+            self.progress.line(8.5),
+            ' 25% | 1 tests | 8.5s elapsed | ~25.5s left | 1 slower than usual | running test_2 for 8.5s '
+            '(usually 3s)',
+        )
+
+    def test_line_without_durations(self):
+        self.progress = progress.Progress(self.stream, {}, 0.0)
+        self.progress.add('test_3', 0.5)
+
+        self.assertEqual(self.progress.line(1.0), '1 tests | 1s elapsed')
+
+    @mock.patch.object(progress.Progress, 'line', return_value='status')
+    def test_render(self, line):
+        self.progress.render()
+        self.stream.write.assert_called_with('status\n')
+
+        self.stream.isatty.return_value = True
+        self.progress = progress.Progress(self.stream, {}, 0.0)
+        self.progress.render()
+        self.stream.write.assert_called_with('\rstatus\x1b[K')
+
+    def test_render_follow(self):
+        follow = mock.Mock(return_value=[{'fixture': 'mod', 'setup': 1.0}, {'id': 'test_1', 'time': 0.5}])
+        self.progress = progress.Progress(self.stream, {'test_1': 1.0}, 4.0, follow)
+
+        self.progress.render()
+
+        self.stream.write.assert_called_with(' 25% | 1 tests | 0ns elapsed | ~0ns left\n')
+
+    @parameterized.expand([
+        (2, ['status\n']),
+        # the line of dots is ended first
+        (1, ['\nstatus\n']),
+    ])
+    @mock.patch.object(progress.Progress, 'line', return_value='status')
+    def test_tick(self, verbosity, expected, line):
+        self.stream.isatty.return_value = True
+        self.progress = progress.Progress(self.stream, {}, 0.0, verbosity=verbosity)
+        self.progress.start()
+        self.assertIsNone(self.progress._thread)
+
+        self.progress.tick()
+        self.default_timer.return_value = self.progress.log_interval
+        self.progress.tick()
+        self.progress.tick()
+
+        self.assertEqual([c[0][0] for c in self.stream.write.call_args_list], expected)
+
+    @mock.patch.object(progress.Progress, 'line', return_value='status')
+    def test_live_shared_stream(self, line):
+        # nose writes on the terminal too, the line is not redrawn in place
+        self.stream.isatty.return_value = True
+        self.progress = progress.Progress(self.stream, {}, 0.0, verbosity=1, live=True)
+        self.progress.tick()
+        self.assertFalse(self.stream.write.called)
+
+        self.progress.render()
+
+        self.stream.write.assert_called_once_with('\nstatus\n')
+
+    @mock.patch.object(progress.Progress, 'line', return_value='status')
+    def test_tick_live(self, line):
+        self.default_timer.return_value = self.progress.log_interval
+        self.progress.tick()
+        self.assertFalse(self.stream.write.called)
+
+    def test_start_close(self):
+        self.progress.interval = self.progress.log_interval = 0.001
+        self.progress.start()
+        time.sleep(0.05)
+        self.progress.close()
+
+        self.assertTrue(self.stream.write.called)
+        self.assertIsNone(self.progress._thread)
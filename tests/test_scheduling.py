@@ -0,0 +1,243 @@
+import unittest
+
+from nose.suite import ContextSuite
+from nose.tools import with_setup
+from parameterized import parameterized
+
+from nosetimer import scheduling
+
+
+class _Case(unittest.TestCase):
+
+    def test_fast(self):
+        pass
+
+    def test_slow(self):
+        pass
+
+
+class _WithFixtures(object):
+
+    @classmethod
+    def setup_class(cls):
+        pass
+
+
+class _SplittableFixtures(_WithFixtures):
+    _multiprocess_can_split_ = True
+
+
+@with_setup(lambda: None)
+def _test_gen():
+    for i in range(3):
+        yield lambda: None
+
+
+class TestDurationIndex(unittest.TestCase):
+
+    def setUp(self):
+        super(TestDurationIndex, self).setUp()
+        self.index = scheduling.DurationIndex({
+            'pkg.mod.Case.test_a': 1.0,
+            'pkg.mod.Case.test_b': 2.0,
+            'pkg.mod.test_func': 4.0,
+            'pkg.module.test_func': 8.0,
+        })
+
+    @parameterized.expand([
+        ('pkg.mod.Case.test_a', 1.0),
+        ('pkg.mod.Case', 3.0),
+        ('pkg.mod', 7.0),  # pkg.module is not a child
+        ('pkg', 15.0),
+        ('pkg.other', 3.0),  # unknown, median of the known durations
+    ])
+    def test_predict(self, prefix, expected):
+        self.assertEqual(self.index.predict(prefix), expected)
+
+    @parameterized.expand([
+        ('pkg.mod.test_gen', 0.6),
+        ('pkg.mod.Case.test_gen', 0.2),
+        ('pkg.mod.Case', 0.2),
+        ('pkg.mod', 1.3),  # with pkg.mod.test_generator
+    ])
+    def test_predict_generators(self, prefix, expected):
+        index = scheduling.DurationIndex({
+            'pkg.mod.test_gen(0,)': 0.2,
+            'pkg.mod.test_gen(1,)': 0.2,
+            'pkg.mod.test_gen(2,)': 0.2,
+            'pkg.mod.Case.test_gen(1, 2)': 0.1,
+            'pkg.mod.Case.test_gen(3, 4)': 0.1,
+            'pkg.mod.test_generator': 0.5,
+        })
+        self.assertAlmostEqual(index.predict(prefix), expected)
+
+    def test_default(self):
+        index = scheduling.DurationIndex({}, default=0.5)
+        self.assertEqual(index.predict('pkg'), 0.5)
+        self.assertEqual(scheduling.DurationIndex({}).default, 0.0)
+
+
+class TestScheduling(unittest.TestCase):
+
+    def _ids(self, suite):
+        return [scheduling.batch_id(batch) for batch in suite]
+
+    def test_batch_id(self):
+        suite = ContextSuite([], context=_WithFixtures)
+        self.assertEqual(scheduling.batch_id(suite), __name__ + '._WithFixtures')
+        self.assertEqual(scheduling.batch_id(_Case('test_fast')), __name__ + '._Case.test_fast')
+
+    def test_iter_batches_splits_suites(self):
+        suite = unittest.TestSuite([_Case('test_fast'), unittest.TestSuite([_Case('test_slow')])])
+
+        self.assertEqual(
+            self._ids(scheduling.iter_batches(suite)),
+            [__name__ + '._Case.test_fast', __name__ + '._Case.test_slow'],
+        )
+
+    @parameterized.expand([
+        (_WithFixtures, 1),
+        (_SplittableFixtures, 2),
+    ])
+    def test_iter_batches_fixtures(self, context, expected):
+        suite = ContextSuite(iter([_Case('test_fast'), _Case('test_slow')]), context=context)
+
+        batches = list(scheduling.iter_batches(suite))
+
+        self.assertEqual(len(batches), expected)
+        # the batch can still be iterated once split out
+        self.assertEqual(sum(len(list(b)) if isinstance(b, unittest.TestSuite) else 1 for b in batches), 2)
+
+    def test_longest_first(self):
+        index = scheduling.DurationIndex({
+            __name__ + '._Case.test_fast': 0.1,
+            __name__ + '._Case.test_slow': 2.0,
+        })
+        suite = unittest.TestSuite([_Case('test_fast'), _Case('test_slow')])
+
+        self.assertEqual(
+            self._ids(scheduling.longest_first(suite, index)),
+            [__name__ + '._Case.test_slow', __name__ + '._Case.test_fast'],
+        )
+
+    @parameterized.expand([
+        (1, ['test_2']),
+        (2, ['test_0', 'test_4']),
+        (3, ['test_1', 'test_3']),
+    ])
+    def test_shard(self, k, expected):
+        index = scheduling.DurationIndex(dict(
+            (__name__ + '._Case.test_{0}'.format(i), time_taken)
+            for i, time_taken in enumerate((5.0, 4.0, 6.0, 1.0, 1.0))
+        ))
+        suite = unittest.TestSuite([_Case('test_fast') for _ in range(5)])
+        for i, case in enumerate(suite):
+            case.id = lambda i=i: __name__ + '._Case.test_{0}'.format(i)
+
+        self.assertEqual(
+            self._ids(scheduling.shard(suite, index, k, 3)),
+            [__name__ + '._Case.' + test_id for test_id in expected],
+        )
+
+    def test_shard_keeps_fixtures_whole(self):
+        suite = ContextSuite(iter([_Case('test_fast'), _Case('test_slow')]), context=_SplittableFixtures)
+        index = scheduling.DurationIndex({}, default=1.0)
+
+        shards = [list(scheduling.shard(suite, index, k, 2)) for k in (1, 2)]
+
+        self.assertEqual([len(tests) for tests in shards], [1, 0])
+
+    def test_shard_balances_the_number_of_tests(self):
+        index = scheduling.DurationIndex({}, default=1.0)
+        suite = unittest.TestSuite([
+            ContextSuite(iter([_Case('test_fast') for _ in range(3)]), context=_WithFixtures),
+            _Case('test_fast'),
+            _Case('test_slow'),
+        ])
+
+        shards = [self._ids(scheduling.shard(suite, index, k, 2)) for k in (1, 2)]
+
+        self.assertEqual(shards, [
+            [__name__ + '._WithFixtures'],
+            [__name__ + '._Case.test_fast', __name__ + '._Case.test_slow'],
+        ])
+
+    @parameterized.expand([
+        (True, [], ['test_slow', 'test_fast', 'test_mid']),
+        (False, [], ['test_mid', 'test_fast', 'test_slow']),
+        # the failed test comes first, along with the suite holding it
+        (False, ['test_slow'], ['test_slow', 'test_fast', 'test_mid']),
+    ])
+    def test_reorder(self, longest, failures, expected):
+        index = scheduling.DurationIndex({
+            __name__ + '._Case.test_fast': 0.1,
+            __name__ + '._Case.test_slow': 2.0,
+        }, default=0.5)
+        cases = [_Case('test_fast'), _Case('test_slow')]
+        mid = _Case('test_fast')
+        mid.id = lambda: __name__ + '._Case.test_mid'
+        suite = unittest.TestSuite([
+            ContextSuite(iter(cases), context=_WithFixtures),
+            mid,
+        ])
+
+        failures = set(__name__ + '._Case.' + name for name in failures)
+
+        reordered = scheduling.reorder(suite, index, failures, longest)
+
+        tests = [t for batch in reordered for t in (batch if isinstance(batch, unittest.TestSuite) else [batch])]
+        self.assertEqual([t.id().rpartition('.')[2] for t in tests], expected)
+
+    def test_predict(self):
+        index = scheduling.DurationIndex({__name__ + '._Case.test_slow': 2.0}, default=0.5)
+        suite = unittest.TestSuite([
+            ContextSuite(iter([_Case('test_fast'), _Case('test_slow')]), context=_WithFixtures),
+            _Case('test_fast'),
+        ])
+
+        batches, expected = scheduling.predict(suite, index)
+
+        # the tests never timed count as the default each, even next to a known one
+        self.assertEqual(expected, 3.0)
+        self.assertEqual(self._ids(batches), [__name__ + '._WithFixtures', __name__ + '._Case.test_fast'])
+
+    @parameterized.expand([
+        # the test never timed, then the failing test, then the shortest
+        (5.0, ['test_2', 'test_3', 'test_4']),
+        (3.0, ['test_1', 'test_3', 'test_4']),
+        (1.5, ['test_4']),
+        (0.0, []),
+    ])
+    def test_select(self, budget, expected):
+        durations = dict(
+            (__name__ + '._Case.test_{0}'.format(i), time_taken)
+            for i, time_taken in enumerate((2.0, 1.0, 3.0, 0.5))
+        )
+        failure_rates = {__name__ + '._Case.test_2': 0.5}
+        suite = unittest.TestSuite([_Case('test_fast') for _ in range(5)])
+        for i, case in enumerate(suite):
+            case.id = lambda i=i: __name__ + '._Case.test_{0}'.format(i)
+
+        selected, skipped = scheduling.select(suite, durations, failure_rates, budget)
+
+        self.assertEqual(self._ids(selected), [__name__ + '._Case.' + test_id for test_id in expected])
+        self.assertEqual(len(expected) + len(skipped), 5)
+
+    def test_select_keeps_fixtures_whole(self):
+        suite = ContextSuite(iter([_Case('test_fast'), _Case('test_slow')]), context=_SplittableFixtures)
+        durations = {__name__ + '._SplittableFixtures.test_fast': 1.0, __name__ + '._SplittableFixtures.test_slow': 1.0}
+
+        selected, skipped = scheduling.select(suite, durations, {}, 1.5)
+
+        self.assertEqual(list(selected), [])
+        self.assertEqual(skipped, [(__name__ + '._SplittableFixtures', 2.0)])
+
+    def test_predict_generator_suite(self):
+        index = scheduling.DurationIndex(dict(
+            (__name__ + '._test_gen({0},)'.format(i), 0.2) for i in range(3)), default=0.1)
+        suite = ContextSuite(iter([_Case('test_fast') for _ in range(3)]), context=_test_gen)
+
+        batches, expected = scheduling.predict(suite, index)
+
+        self.assertEqual(self._ids(batches), [__name__ + '._test_gen'])
+        self.assertAlmostEqual(expected, 0.6)
@@ -0,0 +1,69 @@
+import multiprocessing
+import os
+import unittest
+
+from nosetimer import spool
+
+
+def _put(path, n):
+    worker_spool = spool.ResultSpool(path)
+    for i in range(n):
+        worker_spool.put({'id': 'test_{0}_{1}'.format(os.getpid(), i), 'time': 0.1, 'status': 'success'})
+
+
+class TestResultSpool(unittest.TestCase):
+
+    def setUp(self):
+        super(TestResultSpool, self).setUp()
+        self.spool = spool.ResultSpool.create()
+        self.addCleanup(self.spool.close)
+
+    def test_empty(self):
+        self.assertEqual(list(self.spool), [])
+
+    def test_put(self):
+        self.spool.put({'id': 'test_1', 'time': 0.5, 'status': 'fail'})
+        self.spool.put({'id': 'test_2', 'time': 0.1, 'status': 'success'})
+
+        self.assertEqual(list(self.spool), [
+            {'id': 'test_1', 'time': 0.5, 'status': 'fail'},
+            {'id': 'test_2', 'time': 0.1, 'status': 'success'},
+        ])
+
+    def test_follow(self):
+        self.spool.put({'id': 'test_1', 'time': 0.5, 'status': 'fail'})
+        self.assertEqual([r['id'] for r in self.spool.follow()], ['test_1'])
+
+        self.spool.put({'id': 'test_2', 'time': 0.1, 'status': 'success'})
+        # a torn line is left for later
+        os.write(self.spool._fd, b'{"id": "test_3"')
+        self.assertEqual([r['id'] for r in self.spool.follow()], ['test_2'])
+
+        os.write(self.spool._fd, b', "time": 0.2}\n')
+        self.assertEqual([r['id'] for r in self.spool.follow()], ['test_3'])
+        self.assertEqual(list(self.spool.follow()), [])
+
+    def test_put_from_processes(self):
+        workers = [multiprocessing.Process(target=_put, args=(self.spool.path, 100)) for _ in range(4)]
+        for worker in workers:
+            worker.start()
+        for worker in workers:
+            worker.join()
+
+        records = list(self.spool)
+
+        self.assertEqual(len(records), 400)
+        self.assertEqual(len(os.listdir(self.spool.path)), 4)
+
+    def test_skip_torn_record(self):
+        self.spool.put({'id': 'test_1', 'time': 0.5, 'status': 'fail'})
+        with open(os.path.join(self.spool.path, '0.jsonl'), 'w') as f:
+            f.write('{"id":"test_2","ti')
+
+        self.assertEqual([r['id'] for r in self.spool], ['test_1'])
+
+    def test_close(self):
+        self.spool.put({'id': 'test_1', 'time': 0.5, 'status': 'fail'})
+        self.spool.close()
+
+        self.assertFalse(os.path.exists(self.spool.path))
@@ -0,0 +1,125 @@
+import math
+import unittest
+
+from parameterized import parameterized
+
+from nosetimer import stats
+
+
+class TestStats(unittest.TestCase):
+
+    @parameterized.expand([
+        ([], 50, None),
+        ([1.0], 95, 1.0),
+        ([1.0, 2.0, 3.0], 50, 2.0),
+        ([1.0, 2.0, 3.0, 4.0], 50, 2.5),
+        ([1.0, 2.0, 3.0, 4.0, 5.0], 100, 5.0),
+    ])
+    def test_percentile(self, values, pct, expected):
+        self.assertEqual(stats.percentile(values, pct), expected)
+
+    def test_stdev(self):
+        self.assertEqual(stats.stdev([2.0, 4.0, 4.0, 4.0, 5.0, 5.0, 7.0, 9.0]), math.sqrt(32 / 7.0))
+        self.assertEqual(stats.stdev([1.0]), 0.0)
+
+    def test_mad(self):
+        self.assertEqual(stats.mad([1.0, 2.0, 3.0, 4.0, 100.0]), 1.0)
+
+
+class TestTopN(unittest.TestCase):
+
+    def test_push(self):
+        top = stats.TopN(2)
+        for i, value in enumerate((1.0, 4.0, 2.0, 3.0, 4.0)):
+            top.push('test_{0}'.format(i), value, {'time': value})
+
+        self.assertEqual(len(top), 2)
+        self.assertEqual(top.count, 5)
+        self.assertEqual(top.total, 14.0)
+        self.assertEqual([k for k, _ in top.items()], ['test_4', 'test_1'])
+
+
+class TestLogHistogram(unittest.TestCase):
+
+    def setUp(self):
+        super(TestLogHistogram, self).setUp()
+        self.histogram = stats.LogHistogram()
+
+    def test_empty(self):
+        self.assertIsNone(self.histogram.quantile(50))
+        self.assertEqual(self.histogram.rows(), [])
+
+    def test_quantile_precision(self):
+        for i in range(1, 1001):
+            self.histogram.add(i / 1000.0)
+
+        self.assertEqual(self.histogram.count, 1000)
+        self.assertLessEqual(len(self.histogram.counts), 3 * self.histogram.buckets_per_decade)
+        for pct in (50, 90, 99):
+            self.assertAlmostEqual(self.histogram.quantile(pct), pct / 100.0, delta=pct / 100.0 * 0.03)
+        self.assertEqual(self.histogram.quantile(100), 1.0)
+
+    def test_rows(self):
+        for value in (1e-5, 1e-5, 1e-3):
+            self.histogram.add(value)
+
+        rows = self.histogram.rows(per_decade=1)
+
+        self.assertEqual([count for _, count in rows], [2, 0, 1])
+        self.assertAlmostEqual(rows[2][0], 1e-3)
+
+    @parameterized.expand([
+        (2.5, '2.5s'),
+        (0.0123, '12.3ms'),
+        (0.0000012, '1.2us'),
+        (0.000000012, '12ns'),
+    ])
+    def test_format_duration(self, seconds, expected):
+        self.assertEqual(stats.format_duration(seconds), expected)
+
+
+class TestTimingTree(unittest.TestCase):
+
+    def setUp(self):
+        super(TestTimingTree, self).setUp()
+        self.tree = stats.TimingTree()
+        for test_id, time_taken in (('pkg.mod.Case.test_a', 1.0),
+                                    ('pkg.mod.Case.test_b', 2.0),
+                                    ('pkg.mod.test_gen(1.5, "a.b")', 0.5),
+                                    ('other.test_c', 4.0)):
+            self.tree.add(test_id, time_taken)
+
+    @parameterized.expand([
+        ('pkg.mod.Case.test_a', ['pkg', 'mod', 'Case', 'test_a']),
+        ('pkg.test_gen(1.5, "a.b")', ['pkg', 'test_gen(1.5, "a.b")']),
+        ('test_x', ['test_x']),
+    ])
+    def test_split(self, test_id, expected):
+        self.assertEqual(stats.TimingTree.split(test_id), expected)
+
+    def test_add(self):
+        self.assertEqual((self.tree.total, self.tree.count), (7.5, 4))
+        mod = self.tree.children['pkg'].children['mod']
+        self.assertEqual((mod.total, mod.count, mod.self_time), (3.5, 3, 0.0))
+        self.assertEqual(mod.children['test_gen(1.5, "a.b")'].self_time, 0.5)
+
+    def test_add_self(self):
+        self.tree.add_self('pkg.mod.Case', 0.5)
+
+        case = self.tree.children['pkg'].children['mod'].children['Case']
+        self.assertEqual((case.total, case.count, case.self_time), (3.5, 2, 0.5))
+        self.assertEqual(self.tree.total, 8.0)
+
+    def test_walk(self):
+        rows = [(depth, name, node.total) for depth, name, node in self.tree.walk()]
+
+        self.assertEqual(rows, [(0, 'other', 4.0), (0, 'pkg', 3.5), (1, 'mod', 3.5), (2, 'Case', 3.0)])
+        self.assertEqual([name for _, name, _ in self.tree.walk(limit=1)], ['other'])
+
+    def test_to_dict(self):
+        data = self.tree.to_dict()
+
+        self.assertEqual(data['children']['other'], {
+            'time': 4.0, 'self': 0.0, 'count': 1,
+            'children': {'test_c': {'time': 4.0, 'self': 4.0, 'count': 1}},
+        })
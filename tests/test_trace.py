@@ -0,0 +1,55 @@
+import json
+import os
+import shutil
+import tempfile
+import unittest
+
+from nosetimer import trace
+
+
+class TestTimeline(unittest.TestCase):
+
+    def setUp(self):
+        super(TestTimeline, self).setUp()
+        self.timeline = trace.Timeline()
+        self.timeline.add_test('test_1', {'time': 1.0, 'status': 'success', 'pid': 20, 'start': 101.0, 'end': 102.0})
+        self.timeline.add_test('test_2', {'time': 2.0, 'status': 'fail', 'pid': 10, 'start': 102.5, 'end': 104.5})
+        self.timeline.add_test('test_3', {'time': 0.5, 'status': 'success', 'pid': 20, 'start': 102.0, 'end': 102.5})
+        self.timeline.add_span({'span': 'tests', 'phase': 'setup', 'pid': 20, 'start': 100.0, 'end': 101.0})
+        # without timestamps
+        self.timeline.add_test('test_4', {'time': 0.5, 'status': 'success'})
+
+    def test_workers(self):
+        self.assertEqual(self.timeline.bounds(), (100.0, 104.5))
+        self.assertEqual(self.timeline.workers(), [
+            (20, 2, 2.5, 102.5),
+            (10, 1, 2.0, 104.5),
+        ])
+
+    def test_empty(self):
+        timeline = trace.Timeline()
+        self.assertEqual(timeline.bounds(), (None, None))
+        self.assertEqual(timeline.workers(), [])
+
+    def test_write_trace(self):
+        tmpdir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, tmpdir)
+        path = os.path.join(tmpdir, 'trace.json')
+
+        self.timeline.write_trace(path)
+
+        with open(path) as f:
+            events = json.load(f)['traceEvents']
+        self.assertEqual(events[:4], [
+            {'name': 'process_name', 'ph': 'M', 'pid': 20, 'args': {'name': 'pid 20'}},
+            {'name': 'process_sort_index', 'ph': 'M', 'pid': 20, 'args': {'sort_index': 0}},
+            {'name': 'process_name', 'ph': 'M', 'pid': 10, 'args': {'name': 'pid 10'}},
+            {'name': 'process_sort_index', 'ph': 'M', 'pid': 10, 'args': {'sort_index': 1}},
+        ])
+        self.assertEqual(events[5], {
+            'name': 'test_2', 'cat': 'test', 'ph': 'X', 'pid': 10, 'tid': 10,
+            'ts': 2500000.0, 'dur': 2000000.0, 'args': {'status': 'fail'},
+        })
+        self.assertEqual(events[-1], {
+            'name': 'tests setup', 'cat': 'fixture', 'ph': 'X', 'pid': 20, 'tid': 20, 'ts': 0.0, 'dur': 1000000.0,
+        })
@@ -0,0 +1,49 @@
+import signal
+import threading
+import time
+import unittest
+
+import mock
+
+from nosetimer import watchdog
+
+
+@unittest.skipUnless(watchdog.Watchdog.can_interrupt(), 'tests cannot be interrupted here')
+class TestWatchdog(unittest.TestCase):
+
+    def setUp(self):
+        super(TestWatchdog, self).setUp()
+        self.stream = mock.MagicMock(name='stream')
+        self.watchdog = watchdog.Watchdog(0.05, self.stream)
+        self.addCleanup(self.watchdog.cancel)
+
+    @mock.patch('nosetimer.watchdog.faulthandler')
+    def test_interrupt(self, faulthandler):
+        handler = signal.getsignal(signal.SIGALRM)
+        self.watchdog.start()
+
+        with self.assertRaises(watchdog.TestTimeout):
+            time.sleep(1)
+
+        self.stream.write.assert_any_call('Test timed out after 0.0500s\n')
+        if watchdog.faulthandler is not None:
+            faulthandler.dump_traceback.assert_called_once_with(file=self.stream, all_threads=True)
+        self.assertEqual(signal.getsignal(signal.SIGALRM), handler)
+
+    @mock.patch('nosetimer.watchdog.faulthandler')
+    def test_cancel(self, faulthandler):
+        handler = signal.getsignal(signal.SIGALRM)
+        self.watchdog.start()
+        self.watchdog.cancel()
+
+        time.sleep(0.1)
+
+        self.assertEqual(signal.getsignal(signal.SIGALRM), handler)
+        self.assertFalse(self.stream.write.called)
+
+    def test_dump_stacks(self):
+        watchdog.dump_stacks(self.stream)
+
+        output = ''.join(c[0][0] for c in self.stream.write.call_args_list)
+        self.assertIn('Thread {0} (MainThread)'.format(threading.current_thread().ident), output)
+        self.assertIn('test_dump_stacks', output)